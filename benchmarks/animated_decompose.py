@@ -0,0 +1,96 @@
+"""
+Compares the peak memory and time of decomposing a long GIF with the lazy
+AnimatedDecompose against copying every frame with ImageSequence.all_frames.
+Each mode runs in a fresh process, and its peak RSS is read from
+/proc/self/status after resetting it, so this only runs on Linux.
+
+    python -m benchmarks.animated_decompose [--frames 500] [--size 320]
+"""
+
+import time
+import argparse
+import numpy as np
+import multiprocessing
+
+from io import BytesIO
+from PIL import Image, ImageSequence
+
+from utils.bgr.bgr_media import AnimatedDecompose
+from configuration.command_variables.bgr_variables import MAX_FRAMES
+
+
+def create_gif(framecount: int, size: int) -> bytes:
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+    frames = []
+    for idx in range(framecount):
+        array = background.copy()
+        offset = idx % (size // 2)
+        array[offset : offset + size // 4, offset : offset + size // 4] = 255
+        frames.append(Image.fromarray(array).quantize(64))
+
+    gif_io = BytesIO()
+    frames[0].save(
+        gif_io, format="GIF", save_all=True, append_images=frames[1:], duration=40
+    )
+    return gif_io.getvalue()
+
+
+def decompose_all_frames(image: Image.Image) -> int:
+    """Previous implementation, copies every frame and keeps a sample."""
+    ratio = max(1, -(-image.n_frames // MAX_FRAMES))
+    frames = ImageSequence.all_frames(image)
+    kept_frames = [frame.convert("RGBA") for frame in frames[::ratio]]
+    return len(kept_frames)
+
+
+def decompose_lazy(image: Image.Image) -> int:
+    return AnimatedDecompose(image).create_animated_data().framecount
+
+
+def read_memory_kib(field: str) -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def reset_peak_memory():
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5")
+
+
+def run_mode(mode: str, data: bytes) -> tuple[int, float, int]:
+    """Frames kept, seconds and peak RSS growth in KiB, measured in this process."""
+    decompose = decompose_lazy if mode == "lazy" else decompose_all_frames
+    image = Image.open(BytesIO(data))
+    image.load()
+    reset_peak_memory()
+    baseline = read_memory_kib("VmRSS")
+    start_time = time.perf_counter()
+    framecount = decompose(image)
+    elapsed = time.perf_counter() - start_time
+    peak = read_memory_kib("VmHWM")
+    return framecount, elapsed, peak - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--size", type=int, default=320)
+    args = parser.parse_args()
+
+    data = create_gif(args.frames, args.size)
+    print(f"{args.frames} frames at {args.size}px, MAX_FRAMES={MAX_FRAMES}")
+    print(f"{'mode':<12}{'kept':>6}{'seconds':>10}{'peak MiB':>10}")
+
+    mp_context = multiprocessing.get_context("spawn")
+    for mode in ("all_frames", "lazy"):
+        with mp_context.Pool(1) as pool:
+            framecount, elapsed, peak = pool.apply(run_mode, (mode, data))
+        print(f"{mode:<12}{framecount:>6}{elapsed:>10.2f}{peak / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
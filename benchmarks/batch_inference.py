@@ -0,0 +1,83 @@
+"""
+Compares batched inference through a removal engine, which loads the model
+with a dynamic batch dimension, against rembg's per-frame loop on the
+published model. Runs on synthetic frames, for several batch sizes.
+Requires rembg and its model files.
+
+    python -m benchmarks.batch_inference [--frames 32] [--size 320]
+        [--batch-sizes 1 4 8 16] [--model u2net] [--engine rembg]
+"""
+
+import time
+import argparse
+import numpy as np
+
+from PIL import Image
+from fractions import Fraction
+from rembg.session_base import BaseSession
+from rembg.session_factory import new_session
+
+from utils.bgr.bgr_remove import BGRemove
+from utils.bgr.bgr_engines import REMOVAL_ENGINES, RemovalEngine
+from utils.bgr.bgr_dataclasses import ImageFrame
+from configuration.command_variables.bgr_variables import REMBG_MODEL, REMOVAL_ENGINE
+
+
+def create_frames(framecount: int, size: int) -> list[ImageFrame]:
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(framecount):
+        array = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+        image = Image.fromarray(array)
+        frame = ImageFrame(
+            image=image, width=size, height=size, duration=Fraction(1, 25)
+        )
+        frames.append(frame)
+    return frames
+
+
+def run_per_frame(frames: list[ImageFrame], session: BaseSession) -> float:
+    """Previous loop, one session run through rembg's remove per frame."""
+    start_time = time.perf_counter()
+    for frame in frames:
+        BGRemove(frame, session).remove_background()
+    return time.perf_counter() - start_time
+
+
+def run_batched(
+    frames: list[ImageFrame], engine: RemovalEngine, batch_size: int
+) -> float:
+    start_time = time.perf_counter()
+    for idx in range(0, len(frames), batch_size):
+        engine.remove_background(frames[idx : idx + batch_size])
+    return time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=32)
+    parser.add_argument("--size", type=int, default=320)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--model", default=REMBG_MODEL)
+    parser.add_argument("--engine", default=REMOVAL_ENGINE, choices=REMOVAL_ENGINES)
+    args = parser.parse_args()
+
+    session = new_session(args.model)
+    engine = REMOVAL_ENGINES[args.engine](args.model)
+    # Warms the sessions up so the first run does not pay for it
+    run_per_frame(create_frames(1, args.size), session)
+    engine.warm_up()
+
+    print(f"{args.frames} frames at {args.size}px, model {args.model}")
+    print(f"{'mode':<12}{'seconds':>10}{'ms/frame':>10}")
+    elapsed = run_per_frame(create_frames(args.frames, args.size), session)
+    print(f"{'per-frame':<12}{elapsed:>10.2f}{elapsed * 1000 / args.frames:>10.1f}")
+    for batch_size in args.batch_sizes:
+        frames = create_frames(args.frames, args.size)
+        elapsed = run_batched(frames, engine, batch_size)
+        mode = f"batch {batch_size}"
+        print(f"{mode:<12}{elapsed:>10.2f}{elapsed * 1000 / args.frames:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compares the ImageMagick GIF composer importing raw RGBA pixels against the
+previous PNG round-trip per frame, on a 50-frame 640px input. Requires
+ImageMagick.
+
+    python -m benchmarks.compose_gif [--frames 50] [--size 640]
+"""
+
+import time
+import argparse
+
+from io import BytesIO
+from wand.image import Image as ImageWand
+from wand.api import library as LibraryWand
+
+from benchmarks.gif_encode import create_frames
+from utils.bgr.bgr_media import ComposeGIF
+from utils.bgr.bgr_frames import StoredFrame
+from utils.bgr.bgr_dataclasses import AbstractFrame
+
+
+class PNGRoundTripComposer(ComposeGIF):
+    """Previous implementation, encodes and decodes a PNG for every frame."""
+
+    def _append_frame(self, frame: AbstractFrame):
+        image_io = BytesIO()
+        frame.image.save(image_io, format="PNG")
+        image_io.seek(0)
+
+        with (
+            ImageWand(blob=image_io) as wand_image,
+            ImageWand(
+                width=frame.width, height=frame.height, background=None
+            ) as bg_composite,
+        ):
+            bg_composite.composite(wand_image, 0, 0)
+            LibraryWand.MagickSetImageDispose(bg_composite.wand, self._bg_dispose)
+            bg_composite.delay = int(frame.duration * 100)
+            self._wand.sequence.append(bg_composite)
+
+
+def compose(
+    composer: ComposeGIF, frames: list[StoredFrame]
+) -> tuple[float, float, int]:
+    """
+    Seconds spent appending the frames, seconds spent writing the GIF and
+    the size of the GIF, which should not depend on the import.
+    """
+    start_time = time.perf_counter()
+    for frame in frames:
+        composer.append(frame)
+    append_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    output_io = composer.finalize()
+    write_time = time.perf_counter() - start_time
+    return append_time, write_time, output_io.getbuffer().nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--size", type=int, default=640)
+    args = parser.parse_args()
+
+    frames = create_frames(args.frames, args.size)
+    print(f"{args.frames} frames at {args.size}px")
+    print(f"{'composer':<12}{'append s':>10}{'write s':>10}{'bytes':>12}")
+    for name, composer in (("png", PNGRoundTripComposer()), ("raw", ComposeGIF())):
+        append_time, write_time, size = compose(composer, frames)
+        print(f"{name:<12}{append_time:>10.2f}{write_time:>10.2f}{size:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Times the palette GIF encoder on a 50-frame 640px job with an increasing
+number of encode workers.
+
+    python -m benchmarks.gif_encode [--frames 50] [--size 640] [--workers 1 2 4]
+"""
+
+import os
+import time
+import argparse
+import numpy as np
+
+from fractions import Fraction
+
+from utils.bgr.bgr_frames import FrameStore, StoredFrame
+from utils.bgr.bgr_encoders import PaletteGIFEncoder
+
+
+class FixedWorkersEncoder(PaletteGIFEncoder):
+    def __init__(self, workers: int):
+        super().__init__()
+        self._workers = workers
+
+    def _get_workers(self) -> int:
+        return self._workers
+
+
+def create_frames(framecount: int, size: int) -> list[StoredFrame]:
+    """Cut-out subject moving over a transparent background."""
+    rng = np.random.default_rng(0)
+    subject = rng.integers(0, 256, (size // 2, size // 2, 4), dtype=np.uint8)
+    subject[:, :, 3] = 255
+    store = FrameStore(framecount, size, size)
+    frames = []
+    for idx in range(framecount):
+        array = np.zeros((size, size, 4), dtype=np.uint8)
+        offset = idx * (size // 2) // framecount
+        array[offset : offset + size // 2, offset : offset + size // 2] = subject
+        frames.append(store.add_array(array, Fraction(1, 25)))
+    return frames
+
+
+def encode(frames: list[StoredFrame], workers: int) -> tuple[float, int]:
+    encoder = FixedWorkersEncoder(workers)
+    # Frames are encoded as they are appended, so the appends are timed too
+    start_time = time.perf_counter()
+    for frame in frames:
+        encoder.append(frame)
+    output_io = encoder.finalize()
+    return time.perf_counter() - start_time, output_io.getbuffer().nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--size", type=int, default=640)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    frames = create_frames(args.frames, args.size)
+    print(f"{args.frames} frames at {args.size}px, {os.cpu_count()} CPU core(s)")
+    print(f"{'workers':<10}{'seconds':>10}{'bytes':>12}")
+    for workers in args.workers:
+        elapsed, size = encode(frames, workers)
+        print(f"{workers:<10}{elapsed:>10.2f}{size:>12}")
+
+
+if __name__ == "__main__":
+    main()
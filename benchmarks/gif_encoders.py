@@ -0,0 +1,54 @@
+"""
+Compares the palette GIF encoder against the ImageMagick encoder with its
+optimize pass, in encode time and output size, on a 50-frame 640px job.
+The magick encoder requires ImageMagick.
+
+    python -m benchmarks.gif_encoders [--frames 50] [--size 640]
+        [--encoders palette magick]
+"""
+
+import os
+import time
+import argparse
+
+from benchmarks.gif_encode import create_frames
+from utils.bgr.bgr_frames import StoredFrame
+from utils.bgr.bgr_encoders import (
+    OutputEncoder,
+    PaletteGIFEncoder,
+    MagickGIFEncoder,
+)
+
+GIF_ENCODERS: dict[str, type[OutputEncoder]] = {
+    "palette": PaletteGIFEncoder,
+    "magick": MagickGIFEncoder,
+}
+
+
+def encode(encoder: OutputEncoder, frames: list[StoredFrame]) -> tuple[float, int]:
+    start_time = time.perf_counter()
+    for frame in frames:
+        encoder.append(frame)
+    output_io = encoder.finalize()
+    return time.perf_counter() - start_time, output_io.getbuffer().nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--size", type=int, default=640)
+    parser.add_argument(
+        "--encoders", nargs="+", default=list(GIF_ENCODERS), choices=GIF_ENCODERS
+    )
+    args = parser.parse_args()
+
+    frames = create_frames(args.frames, args.size)
+    print(f"{args.frames} frames at {args.size}px, {os.cpu_count()} CPU core(s)")
+    print(f"{'encoder':<10}{'seconds':>10}{'bytes':>12}")
+    for name in args.encoders:
+        elapsed, size = encode(GIF_ENCODERS[name](), frames)
+        print(f"{name:<10}{elapsed:>10.2f}{size:>12}")
+
+
+if __name__ == "__main__":
+    main()
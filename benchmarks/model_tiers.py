@@ -0,0 +1,157 @@
+"""
+Reports the latency and mask IoU of every model tier on a fixed set of
+fixture images. Masks are compared against the masks of the reference tier,
+and against the drawn subjects when the fixtures are generated.
+
+Without a directory, the fixtures are generated from a fixed seed: shapes
+over a textured background, so every run sees the same images.
+
+    python -m benchmarks.model_tiers [path/to/fixtures] [--engine onnx]
+        [--count 12] [--size 480]
+"""
+
+import os
+import time
+import argparse
+import numpy as np
+
+from PIL import Image, ImageDraw
+from PIL.Image import Image as ImageType
+from fractions import Fraction
+from typing import Union
+
+from utils.bgr.bgr_engines import REMOVAL_ENGINES, RemovalEngine
+from utils.bgr.bgr_dataclasses import ImageFrame
+from configuration.command_variables.bgr_variables import (
+    MODEL_TIERS,
+    REMOVAL_ENGINE,
+)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+
+def load_fixtures(directory: str) -> list[ImageType]:
+    filenames = sorted(
+        filename
+        for filename in os.listdir(directory)
+        if filename.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    return [
+        Image.open(os.path.join(directory, name)).convert("RGBA") for name in filenames
+    ]
+
+
+def create_background(rng: np.random.Generator, size: int) -> np.ndarray:
+    """Colour gradient with noise, so the subject is not cut by colour alone."""
+    ramp = np.linspace(0, 1, size, dtype=np.float32)
+    start, end = rng.uniform(0, 255, (2, 3))
+    gradient = start + (end - start) * ramp[:, np.newaxis, np.newaxis]
+    noise = rng.normal(0, 12, (size, size, 3))
+    return np.clip(gradient + noise, 0, 255).astype(np.uint8)
+
+
+def draw_subject(rng: np.random.Generator, size: int) -> ImageType:
+    """Mask of an ellipse, with a random polygon centred below it."""
+    mask = Image.new("L", (size, size))
+    draw = ImageDraw.Draw(mask)
+    cx, cy = rng.uniform(0.35, 0.65, 2) * size
+    rx, ry = rng.uniform(0.12, 0.25, 2) * size
+    draw.ellipse((cx - rx, cy - ry, cx + rx, cy + ry), fill=255)
+    angles = np.sort(rng.uniform(0, 2 * np.pi, 6))
+    radii = rng.uniform(0.1, 0.3, 6) * size
+    points = [
+        (cx + radius * np.cos(angle), cy + ry + radius * np.sin(angle))
+        for angle, radius in zip(angles, radii)
+    ]
+    draw.polygon(points, fill=255)
+    return mask
+
+
+def generate_fixtures(
+    count: int, size: int
+) -> tuple[list[ImageType], list[np.ndarray]]:
+    """Images and the masks of their subjects, the same for every run."""
+    rng = np.random.default_rng(0)
+    images, masks = [], []
+    for _ in range(count):
+        background = create_background(rng, size)
+        subject = np.clip(
+            rng.uniform(0, 255, 3) + rng.normal(0, 20, (size, size, 3)), 0, 255
+        ).astype(np.uint8)
+        mask = np.asarray(draw_subject(rng, size)) > 127
+        array = np.where(mask[:, :, np.newaxis], subject, background)
+        images.append(Image.fromarray(array).convert("RGBA"))
+        masks.append(mask)
+    return images, masks
+
+
+def create_frame(image: ImageType) -> ImageFrame:
+    width, height = image.size
+    return ImageFrame(
+        image=image.copy(), width=width, height=height, duration=Fraction(0)
+    )
+
+
+def get_masks(
+    engine: RemovalEngine, images: list[ImageType]
+) -> tuple[list[np.ndarray], float]:
+    """Masks of the images and the mean seconds per image, after a warm-up."""
+    engine.warm_up()
+    masks = []
+    elapsed = 0.0
+    for image in images:
+        frame = create_frame(image)
+        start_time = time.perf_counter()
+        engine.remove_background([frame])
+        elapsed += time.perf_counter() - start_time
+        masks.append(np.asarray(frame.image)[:, :, 3] > 127)
+    return masks, elapsed / max(1, len(images))
+
+
+def compute_iou(mask: np.ndarray, reference: np.ndarray) -> float:
+    union = np.logical_or(mask, reference).sum()
+    if not union:
+        return 1.0
+    return float(np.logical_and(mask, reference).sum() / union)
+
+
+def mean_iou(masks: list[np.ndarray], references: list[np.ndarray]) -> float:
+    ious = [compute_iou(mask, ref) for mask, ref in zip(masks, references)]
+    return sum(ious) / max(1, len(ious))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("fixtures", nargs="?", help="Directory of fixture images")
+    parser.add_argument("--engine", default=REMOVAL_ENGINE, choices=REMOVAL_ENGINES)
+    parser.add_argument("--reference", default="quality", choices=MODEL_TIERS)
+    parser.add_argument("--count", type=int, default=12)
+    parser.add_argument("--size", type=int, default=480)
+    args = parser.parse_args()
+
+    truth_masks: Union[list[np.ndarray], None] = None
+    if args.fixtures:
+        images = load_fixtures(args.fixtures)
+    else:
+        images, truth_masks = generate_fixtures(args.count, args.size)
+    engine_type = REMOVAL_ENGINES[args.engine]
+    results = {}
+    for tier, model_name in MODEL_TIERS.items():
+        results[tier] = get_masks(engine_type(model_name), images)
+
+    reference_masks, _ = results[args.reference]
+    print(f"{len(images)} fixtures, {args.engine} engine, IoU against {args.reference}")
+    header = f"{'tier':<12}{'model':<16}{'ms/image':>10}{'mean IoU':>10}"
+    if truth_masks:
+        header += f"{'truth IoU':>11}"
+    print(header)
+    for tier, (masks, seconds) in results.items():
+        row = f"{tier:<12}{MODEL_TIERS[tier]:<16}{seconds * 1000:>10.1f}"
+        row += f"{mean_iou(masks, reference_masks):>10.3f}"
+        if truth_masks:
+            row += f"{mean_iou(masks, truth_masks):>11.3f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,29 @@ from nextcord import Activity, ActivityType, Intents
 from nextcord.ext.commands import Bot
 
 from configuration.bot_config import BOT_TOKEN, COMMAND_PREFIX
+from utils.http_client import HTTPClient
+from utils.bgr.bgr_pool import InferencePool
+from utils.bgr.bgr_models import ModelStore
 
 logger = logging.getLogger("nextcord")
 
 
+class LifecycleBot(Bot):
+    """Bot which opens and closes the shared resources with its connection."""
+
+    async def start(self, *args, **kwargs):
+        ModelStore().validate_models()
+        HTTPClient().open()
+        await super().start(*args, **kwargs)
+
+    async def close(self):
+        try:
+            await super().close()
+        finally:
+            await HTTPClient().close()
+            InferencePool().shutdown()
+
+
 class BotClientBase:
     def __init__(self):
         self._token = self._get_token()
@@ -21,7 +40,7 @@ class BotClientBase:
 
     def _set_bot(self) -> Bot:
         intents = Intents.all()
-        bot_client = Bot(
+        bot_client = LifecycleBot(
             command_prefix=self._prefix,
             intents=intents,
             activity=Activity(type=ActivityType.watching, name=self._activity),
@@ -2,6 +2,7 @@ from nextcord.ext.commands import Context
 
 from utils.general_utils import EmbedForm, ContextAttachment
 from utils.bgr.bgr_handler import MediaHandler
+from utils.bgr.bgr_options import OptionParser
 from exceptions.bot_exceptions import BaseBotException
 from logger.exception_logging import ExceptionLogger
 
@@ -12,10 +13,10 @@ bot = client.get_bot()
 
 
 @bot.command(description="")
-async def rembg(ctx: Context):
+async def rembg(ctx: Context, *options: str):
     """Command to remove the background of images or videos."""
-    file_attachment = await ContextAttachment(ctx).any_file_attachment()
-    if not file_attachment:
+    attachment_url = ContextAttachment(ctx).any_attachment_url()
+    if not attachment_url:
         embed_form = EmbedForm().as_error()
         embed_form.set_description(
             "Upload an image with the command, "
@@ -25,7 +26,8 @@ async def rembg(ctx: Context):
         return
 
     try:
-        file = await MediaHandler(ctx, file_attachment).handler()
+        request_options = OptionParser(options).parse()
+        file = await MediaHandler(ctx, attachment_url, request_options).handler()
         if file:
             await ctx.reply(file=file, mention_author=False)
 
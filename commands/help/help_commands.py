@@ -2,7 +2,7 @@ from nextcord.ext.commands import Context
 
 from utils.help.help_utils import HelpMenu
 from utils.help.help_dcs import (
-    MediaWRefInput,
+    MediaWRefOptionsInput,
 )
 
 from bot_instance import BotClient
@@ -26,5 +26,7 @@ async def help(ctx: Context):
 async def helpbgr(ctx: Context):
     help_menu = HelpMenu()
     help_menu.set_title("Background Removal")
-    help_menu.add_command("rembg", "Removes background from media.", MediaWRefInput())
+    help_menu.add_command(
+        "rembg", "Removes background from media.", MediaWRefOptionsInput()
+    )
     await help_menu.reply(ctx)
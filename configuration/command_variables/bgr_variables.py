@@ -1,3 +1,48 @@
+MAX_FILE_SIZE_MB: int = 25
 MAX_FRAMES: int = 50
 MAX_PX_IMAGE: int = 6000
 MAX_PX_ANIMATED: int = 640
+MAX_VIDEO_DURATION: int = 60
+DOWNSCALE_OVERSIZED: bool = False
+
+REMBG_MODEL: str = "u2net"
+MODEL_TIERS: dict[str, str] = {
+    "fast": "u2netp",
+    "quantized": "u2net_quant",  # INT8 weights, generated from u2net on first use
+    "quality": "u2net",
+}
+ANIMATED_MODEL_TIER: str = "fast"
+SESSION_WARMUP: bool = True
+SESSION_MEMORY_CAP_MB: int = 1024
+REMOVAL_ENGINE: str = "rembg"  # "rembg" or "onnx"
+ONNX_INTRA_OP_THREADS: int = 0  # 0 lets onnxruntime decide
+ONNX_INTER_OP_THREADS: int = 0
+ONNX_GRAPH_OPTIMIZATION: str = "all"  # "disable", "basic", "extended" or "all"
+ONNX_MEMORY_ARENA: bool = True
+INFERENCE_BATCH_SIZE: int = 8
+INFERENCE_BACKEND: str = "thread"  # "thread" or "process"
+INFERENCE_WORKERS: int = 2
+PIPELINE_QUEUE_DEPTH: int = 8
+PROGRESS_INTERVAL: float = 2.0
+PROGRESS_THUMBNAIL_PX: int = 256
+MAX_CONCURRENT_JOBS: int = 2
+MAX_JOBS_PER_USER: int = 1
+MAX_JOBS_PER_GUILD: int = 5
+RESULT_CACHE_DIRECTORY: str = "cache/results"
+RESULT_CACHE_MEMORY_MB: int = 128
+RESULT_CACHE_DISK_MB: int = 2048
+DEDUPE_CHUNK_SIZE: int = 8
+DEDUPE_DOWNSAMPLE: int = 1
+FRAME_MEMORY_PER_JOB_MB: int = 64
+FRAME_MEMORY_GLOBAL_MB: int = 256
+FRAME_SCRATCH_DIRECTORY: str = ""  # Empty for the system temp directory
+OUTPUT_FORMAT: str = "gif"  # "gif", "webp", "webp_lossless" or "apng"
+WEBP_QUALITY: int = 80
+WEBP_METHOD: int = 4
+GIF_ENCODER: str = "palette"  # "palette" or "magick"
+GIF_ALPHA_THRESHOLD: int = 128
+ENCODE_WORKERS: int = 0  # 0 for one per CPU core
+STILL_ENCODE_MODE: str = "balanced"  # "fast", "balanced" or "small"
+STILL_CROP: bool = True
+STILL_CROP_PADDING: int = 8
+DEFAULT_UPLOAD_LIMIT_MB: int = 8  # For direct messages, guilds use their own limit
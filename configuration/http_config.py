@@ -0,0 +1,9 @@
+HTTP_TOTAL_TIMEOUT: float = 30.0
+HTTP_CONNECT_TIMEOUT: float = 5.0
+HTTP_READ_TIMEOUT: float = 10.0
+HTTP_MAX_CONNECTIONS: int = 100
+HTTP_MAX_CONNECTIONS_PER_HOST: int = 10
+HTTP_KEEPALIVE_TIMEOUT: float = 30.0
+HTTP_DNS_CACHE_TTL: int = 300
+HTTP_RETRIES: int = 3
+HTTP_RETRY_BACKOFF: float = 0.5
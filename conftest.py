@@ -0,0 +1 @@
+# Places the repository root on sys.path so tests import the bot's packages
@@ -1,9 +1,25 @@
+import asyncio
+
 from bot_instance import BotClient
+from utils.bgr.bgr_sessions import SessionRegistry
+from utils.bgr.bgr_models import ModelStore
+from utils.bgr.bgr_pool import InferencePool
+from configuration.command_variables.bgr_variables import (
+    SESSION_WARMUP,
+    INFERENCE_BACKEND,
+)
 
 client = BotClient()
 bot = client.get_bot()
+registry = SessionRegistry()
 
 
 @bot.event
 async def on_ready():
     print('Bot is ready.')
+    if SESSION_WARMUP and INFERENCE_BACKEND == "process":
+        # Models are only loaded in the workers, not in the bot process
+        await InferencePool().warm_up()
+    elif SESSION_WARMUP:
+        for model_name in ModelStore().get_default_models():
+            await asyncio.to_thread(registry.warm_up, model_name=model_name)
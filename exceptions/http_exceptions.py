@@ -21,3 +21,20 @@ class UnsupportedMimeType(BaseBotException):
     def __init__(self, mime_type: str):
         msg = "Detected file mime type as: " f"'{mime_type}', which is not supported."
         super().__init__(msg)
+
+
+class ExceedsMaxFileSize(BaseBotException):
+    """An exception raised when a downloaded file exceeds a specified size limit."""
+
+    def __init__(self, max_bytes: int):
+        max_mb = max_bytes / 1024 / 1024
+        msg = f"File exceeds the maximum size of {max_mb:.1f}MB."
+        super().__init__(msg)
+
+
+class ResponseStatusError(BaseBotException):
+    """An exception raised when an HTTP response has an unsuccessful status."""
+
+    def __init__(self, status: int):
+        msg = f"Could not download the file, server responded with {status}."
+        super().__init__(msg)
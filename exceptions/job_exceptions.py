@@ -0,0 +1,23 @@
+from exceptions.bot_exceptions import BaseBotException
+
+
+class ExceedsUserJobLimit(BaseBotException):
+    """An exception raised when a user has too many jobs queued or running."""
+
+    def __init__(self, max_jobs: int):
+        msg = (
+            f"You can have at most {max_jobs} job(s) in progress.\n"
+            "Wait for your current job to finish."
+        )
+        super().__init__(msg)
+
+
+class ExceedsGuildJobLimit(BaseBotException):
+    """An exception raised when a guild has too many jobs queued or running."""
+
+    def __init__(self, max_jobs: int):
+        msg = (
+            f"This server can have at most {max_jobs} jobs in progress.\n"
+            "Try again once a job has finished."
+        )
+        super().__init__(msg)
@@ -67,3 +67,31 @@ class SubceedsMinResolution(BaseBotException):
             f"Resolution: {width}x{height}"
         )
         super().__init__(msg)
+
+
+class ExceedsMaxDuration(BaseBotException):
+    """An exception raised when a video exceeds a specified duration limit."""
+
+    def __init__(self, fp_format: str, duration: float, max_duration: int):
+        msg = (
+            f"{fp_format.upper()} exceeds maximum duration of {max_duration}s.\n"
+            f"Duration: {duration:.1f}s"
+        )
+        super().__init__(msg)
+
+
+class ExceedsUploadLimit(BaseBotException):
+    """An exception raised when a result cannot be encoded within the upload limit."""
+
+    def __init__(self, max_bytes: int):
+        max_mb = max_bytes / 1024 / 1024
+        msg = f"The result could not be made to fit the upload limit of {max_mb:.1f}MB."
+        super().__init__(msg)
+
+
+class NoFramesToEncode(BaseBotException):
+    """An exception raised when no frames reach the encoder."""
+
+    def __init__(self):
+        msg = "No frames could be decoded from the media."
+        super().__init__(msg)
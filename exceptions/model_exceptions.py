@@ -0,0 +1,12 @@
+from exceptions.bot_exceptions import BaseBotException
+
+
+class UnavailableModel(BaseBotException):
+    """An exception raised when a model can neither be found nor obtained."""
+
+    def __init__(self, model_name: str):
+        msg = (
+            f"Model '{model_name}' is not available.\n"
+            "It is neither downloaded nor published by the installed rembg."
+        )
+        super().__init__(msg)
@@ -0,0 +1,12 @@
+from exceptions.bot_exceptions import BaseBotException
+
+
+class UnsupportedOption(BaseBotException):
+    """An exception raised when a command option is not recognized."""
+
+    def __init__(self, option: str, supported: list[str]):
+        msg = (
+            f"Option '{option}' is not supported.\n"
+            f"Supported options: {', '.join(supported)}."
+        )
+        super().__init__(msg)
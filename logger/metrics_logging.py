@@ -0,0 +1,29 @@
+import logging
+
+from typing import Union
+from typing_extensions import Self
+
+logger = logging.getLogger("nextcord")
+
+
+class MetricsLogger:
+    def __init__(self, name: str):
+        self.name = name
+        self.metrics: dict[str, Union[int, float, str]] = {}
+
+    def add(self, key: str, value: Union[int, float, str]) -> Self:
+        self.metrics.update({key: value})
+        return self
+
+    def log(self):
+        metrics_string = ", ".join(
+            f"{key}={self.format_value(value)}" for key, value in self.metrics.items()
+        )
+        logging_string = f"Metrics [{self.name}]: {metrics_string}"
+        logger.log(logging.INFO, logging_string)
+
+    @staticmethod
+    def format_value(value: Union[int, float, str]) -> str:
+        if isinstance(value, float):
+            return f"{value:.3f}"
+        return str(value)
@@ -0,0 +1,19 @@
+import os
+
+from utils.bgr.bgr_cache import CachedResult, DiskTier
+
+
+def test_entries_survive_restarts(tmp_path):
+    DiskTier(str(tmp_path), 1024).put("key", CachedResult(data=b"data", ext="gif"))
+
+    result = DiskTier(str(tmp_path), 1024).get("key")
+    assert result == CachedResult(data=b"data", ext="gif")
+
+
+def test_interrupted_writes_are_deleted(tmp_path):
+    (tmp_path / "key.gif").write_bytes(b"data")
+    (tmp_path / "other.gif.tmp").write_bytes(b"partial")
+
+    disk_tier = DiskTier(str(tmp_path), 1024)
+    assert disk_tier.get("key") is not None
+    assert os.listdir(tmp_path) == ["key.gif"]
@@ -0,0 +1,81 @@
+import pytest
+import numpy as np
+
+from PIL import Image
+from fractions import Fraction
+
+pytest.importorskip("av")
+pytest.importorskip("wand")
+
+from utils.bgr.bgr_encoders import (  # noqa: E402
+    OUTPUT_ENCODERS,
+    PaletteGIFEncoder,
+    create_encoder,
+)
+from utils.bgr.bgr_budget import OutputBudget  # noqa: E402
+from utils.bgr.bgr_dataclasses import ImageFrame  # noqa: E402
+from exceptions.media_exceptions import NoFramesToEncode  # noqa: E402
+
+
+def create_frame(offset: int) -> ImageFrame:
+    array = np.zeros((32, 32, 4), dtype=np.uint8)
+    array[8:24, offset : offset + 8] = (255, 0, 0, 255)
+    # Pillow decodes WebP animations without translucent pixels as RGB
+    array[0, 0] = (0, 255, 0, 128)
+    image = Image.fromarray(array)
+    return ImageFrame(image=image, width=32, height=32, duration=Fraction(1, 10))
+
+
+@pytest.mark.parametrize("output_format", ["webp_lossless", "apng"])
+def test_lossless_formats_round_trip(output_format: str):
+    frames = [create_frame(offset) for offset in (0, 8, 16)]
+    encoder = create_encoder(output_format)
+    for frame in frames:
+        encoder.append(frame)
+
+    with Image.open(encoder.finalize()) as image:
+        assert image.n_frames == len(frames)
+        for idx, frame in enumerate(frames):
+            image.seek(idx)
+            decoded = np.asarray(image.convert("RGBA"))
+            assert (decoded == np.asarray(frame.image)).all()
+
+
+@pytest.mark.parametrize("output_format", sorted(OUTPUT_ENCODERS))
+def test_finalize_without_frames_raises(output_format: str):
+    encoder = create_encoder(output_format)
+    with pytest.raises(NoFramesToEncode):
+        encoder.finalize()
+
+
+def test_gif_frames_are_encoded_as_they_arrive(monkeypatch: pytest.MonkeyPatch):
+    encoder = PaletteGIFEncoder()
+    monkeypatch.setattr(encoder, "_get_workers", lambda: 1)
+    frames = [create_frame(offset) for offset in range(0, 24, 2)]
+    for frame in frames[: encoder.sample_frames]:
+        encoder.append(frame)
+    sampled_size = encoder._writer._gif_io.tell()
+
+    for frame in frames[encoder.sample_frames :]:
+        encoder.append(frame)
+    assert encoder._writer._gif_io.tell() > sampled_size
+
+    with Image.open(encoder.finalize()) as image:
+        assert image.n_frames == len(frames)
+
+
+def test_over_budget_output_is_encoded_once_more():
+    frames = [create_frame(offset) for offset in range(0, 24, 2)]
+    encoder = PaletteGIFEncoder()
+    for frame in frames:
+        encoder.append(frame)
+    size = encoder.finalize().getbuffer().nbytes
+
+    encoder = PaletteGIFEncoder()
+    encoder.set_budget(OutputBudget(size * 3 // 4))
+    for frame in frames:
+        encoder.append(frame)
+    output_io = encoder.finalize()
+
+    assert output_io.getbuffer().nbytes <= size * 3 // 4
+    assert encoder._attempts == 2
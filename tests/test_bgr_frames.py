@@ -0,0 +1,39 @@
+import gc
+import numpy as np
+
+from PIL import Image
+from fractions import Fraction
+
+from utils.bgr.bgr_frames import FrameMemoryBudget, FrameStore
+
+
+def create_array(value: int) -> np.ndarray:
+    return np.full((8, 8, 4), value, dtype=np.uint8)
+
+
+def test_frames_beyond_the_job_budget_are_spilled(monkeypatch):
+    budget = FrameMemoryBudget()
+    frame_size = 8 * 8 * 4
+    monkeypatch.setattr(budget, "_job_limit", 2 * frame_size)
+    in_use = budget.get_in_use()
+
+    store = FrameStore(4, 8, 8)
+    frames = [store.add_array(create_array(idx), Fraction(1)) for idx in range(4)]
+    assert store.get_spilled_count() == 2
+    assert budget.get_in_use() == in_use + 2 * frame_size
+    assert [int(frame.array[0, 0, 0]) for frame in frames] == [0, 1, 2, 3]
+
+    del frames, store
+    gc.collect()
+    assert budget.get_in_use() == in_use
+
+
+def test_budget_is_reserved_as_frames_are_added():
+    budget = FrameMemoryBudget()
+    in_use = budget.get_in_use()
+
+    store = FrameStore(10, 8, 8)
+    assert budget.get_in_use() == in_use
+    frame = store.add_image(Image.new("RGB", (8, 8)), Fraction(1))
+    assert budget.get_in_use() == in_use + 8 * 8 * 4
+    assert frame.image.mode == "RGBA"
@@ -0,0 +1,38 @@
+import pytest
+import numpy as np
+
+from PIL import Image
+from fractions import Fraction
+
+pytest.importorskip("av")
+pytest.importorskip("wand")
+
+from utils.bgr.bgr_media import DisposeDuplicateStream  # noqa: E402
+from utils.bgr.bgr_dataclasses import ImageFrame  # noqa: E402
+
+
+def create_frame(value: int) -> ImageFrame:
+    array = np.full((16, 16, 4), value, dtype=np.uint8)
+    image = Image.fromarray(array)
+    return ImageFrame(image=image, width=16, height=16, duration=Fraction(1, 10))
+
+
+def dispose(frames: list[ImageFrame]) -> list[ImageFrame]:
+    frame_disposal = DisposeDuplicateStream()
+    kept_frames = frame_disposal.push(frames)
+    last_frame = frame_disposal.flush()
+    if last_frame:
+        kept_frames.append(last_frame)
+    return kept_frames
+
+
+def test_large_differences_are_kept():
+    frames = [create_frame(0), create_frame(255), create_frame(0)]
+    assert len(dispose(frames)) == 3
+
+
+def test_duplicates_are_merged():
+    frames = [create_frame(0), create_frame(0), create_frame(200)]
+    kept_frames = dispose(frames)
+    assert len(kept_frames) == 2
+    assert kept_frames[0].duration == Fraction(2, 10)
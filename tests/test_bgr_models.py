@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("rembg")
+onnx = pytest.importorskip("onnx")
+ort = pytest.importorskip("onnxruntime")
+
+from onnx import TensorProto, helper, numpy_helper  # noqa: E402
+
+from utils.bgr.bgr_models import ModelStore  # noqa: E402
+
+
+def create_model(path: str):
+    """Convolution exported with a fixed batch size of 1, like u2net."""
+    weights = np.full((1, 3, 3, 3), 0.1, dtype=np.float32)
+    graph = helper.make_graph(
+        [helper.make_node("Conv", ["input", "weights"], ["mask"], pads=[1] * 4)],
+        "model",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, [1, 3, 8, 8])],
+        [helper.make_tensor_value_info("mask", TensorProto.FLOAT, [1, 1, 8, 8])],
+        [numpy_helper.from_array(weights, "weights")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 7
+    onnx.save(onnx.shape_inference.infer_shapes(model), path)
+
+
+def test_batched_model_runs_several_frames(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("U2NET_HOME", str(tmp_path))
+    create_model(str(tmp_path / "u2netp.onnx"))
+
+    model_path = ModelStore().ensure_batched_model("u2netp")
+    session = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+    batch = np.random.default_rng(0).random((4, 3, 8, 8), dtype=np.float32)
+    masks = session.run(None, {"input": batch})[0]
+
+    fixed_session = ort.InferenceSession(
+        str(tmp_path / "u2netp.onnx"), providers=["CPUExecutionProvider"]
+    )
+    for idx in range(len(batch)):
+        mask = fixed_session.run(None, {"input": batch[idx : idx + 1]})[0]
+        assert np.allclose(masks[idx : idx + 1], mask)
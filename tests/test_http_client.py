@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+
+from utils.http_client import HTTPClient  # noqa: E402
+
+
+async def fetch_all(app: web.Application, count: int) -> list[int]:
+    client = HTTPClient()
+    statuses = []
+    try:
+        async with TestServer(app) as server:
+            url = str(server.make_url("/"))
+            for _ in range(count):
+                response = await client.get(url)
+                await response.read()
+                response.release()
+                statuses.append(response.status)
+    finally:
+        await client.close()
+    return statuses
+
+
+def test_connection_is_reused():
+    peers = []
+
+    async def handle(request: web.Request) -> web.Response:
+        peers.append(request.transport.get_extra_info("peername"))
+        return web.Response(body=b"data")
+
+    app = web.Application()
+    app.router.add_get("/", handle)
+    statuses = asyncio.run(fetch_all(app, 5))
+
+    assert statuses == [200] * 5
+    assert len(peers) == 5
+    assert len(set(peers)) == 1
+
+
+def test_server_error_is_retried(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(HTTPClient(), "_backoff", 0.0)
+    attempts = []
+
+    async def handle(request: web.Request) -> web.Response:
+        attempts.append(request.path)
+        if len(attempts) == 1:
+            return web.Response(status=503)
+        return web.Response(body=b"data")
+
+    app = web.Application()
+    app.router.add_get("/", handle)
+    statuses = asyncio.run(fetch_all(app, 1))
+
+    assert statuses == [200]
+    assert len(attempts) == 2
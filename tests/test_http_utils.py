@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("nextcord")
+pytest.importorskip("sniffpy")
+
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+
+from utils.http_client import HTTPClient  # noqa: E402
+from utils.http_utils import ContextHTTPFile  # noqa: E402
+from exceptions.http_exceptions import ResponseStatusError  # noqa: E402
+
+
+def create_ftyp(major_brand: bytes, compatible_brands: list[bytes]) -> bytes:
+    size = 16 + 4 * len(compatible_brands)
+    box = size.to_bytes(4, "big") + b"ftyp" + major_brand + bytes(4)
+    return box + b"".join(compatible_brands) + bytes(64)
+
+
+@pytest.mark.parametrize(
+    "major_brand, compatible_brands",
+    [
+        (b"isom", [b"isom", b"iso2", b"avc1", b"mp41"]),
+        (b"mp42", [b"mp42", b"isom"]),
+        (b"dash", [b"iso6", b"mp41"]),
+    ],
+)
+def test_mp4_brands_are_mp4(major_brand: bytes, compatible_brands: list[bytes]):
+    head = create_ftyp(major_brand, compatible_brands)
+    assert ContextHTTPFile()._sniff_mime_type(head) == "mp4"
+
+
+@pytest.mark.parametrize(
+    "major_brand, compatible_brands",
+    [
+        (b"heic", [b"mif1", b"heic"]),
+        (b"avif", [b"avif", b"mif1", b"miaf"]),
+        (b"qt  ", [b"qt  "]),
+    ],
+)
+def test_other_brands_are_not_mp4(major_brand: bytes, compatible_brands: list[bytes]):
+    head = create_ftyp(major_brand, compatible_brands)
+    assert ContextHTTPFile()._sniff_mime_type(head) != "mp4"
+
+
+async def probe(app: web.Application, max_bytes: int) -> None:
+    try:
+        async with TestServer(app) as server:
+            url = str(server.make_url("/"))
+            async with ContextHTTPFile() as http_file:
+                await http_file._probe_url(url, max_bytes)
+    finally:
+        await HTTPClient().close()
+
+
+@pytest.mark.parametrize("status", [403, 404])
+def test_error_status_is_rejected(status: int):
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(status=status, body=b"<html>Not here</html>")
+
+    app = web.Application()
+    app.router.add_get("/", handle)
+    with pytest.raises(ResponseStatusError):
+        asyncio.run(probe(app, 1024))
@@ -0,0 +1,70 @@
+import math
+
+from utils.bgr.bgr_dataclasses import EncodePlan
+
+
+class OutputBudgetBase:
+    # Share of the limit aimed at, as estimates are not exact
+    margin = 0.9
+    min_scale = 0.25
+    min_frames = 10
+    palette_sizes = (255, 128, 64)
+
+    def __init__(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._target_bytes = int(max_bytes * self.margin)
+
+    def _reduce_colors(self, colors: int, ratio: float) -> tuple[int, float]:
+        smaller_sizes = [size for size in self.palette_sizes if size < colors]
+        if not smaller_sizes:
+            return colors, ratio
+        # Codes are about a bit shorter for every halving of the palette
+        reduced = smaller_sizes[0]
+        factor = math.log2(reduced + 1) / math.log2(colors + 1)
+        return reduced, ratio / factor
+
+    def _plan(
+        self, size: int, framecount: int, plan: EncodePlan, palette: bool
+    ) -> EncodePlan:
+        ratio = self._target_bytes / max(1, size)
+        if ratio >= 1:
+            return plan
+
+        colors, scale, frame_step = plan.colors, plan.scale, plan.frame_step
+        if palette:
+            colors, ratio = self._reduce_colors(colors, ratio)
+
+        if ratio < 1 and framecount // (frame_step * 2) >= self.min_frames:
+            frame_step *= 2
+            ratio *= 2
+
+        if ratio < 1:
+            # The size follows the pixel count, so both sides scale by the root
+            scale = max(self.min_scale, scale * math.sqrt(ratio))
+
+        return EncodePlan(colors=colors, scale=scale, frame_step=frame_step)
+
+
+class OutputBudget(OutputBudgetBase):
+    """
+    Chooses the palette size, scale and frame step of a result so that it
+    fits within the upload limit of the destination.
+    """
+
+    def __init__(self, max_bytes: int):
+        super().__init__(max_bytes)
+
+    def get_max_bytes(self) -> int:
+        return self._max_bytes
+
+    def fits(self, size: int) -> bool:
+        return size <= self._max_bytes
+
+    def plan(
+        self, size: int, framecount: int, plan: EncodePlan, palette: bool
+    ) -> EncodePlan:
+        """
+        Returns a plan reduced from the given one, so that a result of the
+        given size with that plan would fit within the target.
+        """
+        return self._plan(size, framecount, plan, palette)
@@ -0,0 +1,254 @@
+import os
+import logging
+import hashlib
+import threading
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Union
+
+from configuration.command_variables.bgr_variables import (
+    RESULT_CACHE_DIRECTORY,
+    RESULT_CACHE_MEMORY_MB,
+    RESULT_CACHE_DISK_MB,
+)
+
+logger = logging.getLogger("nextcord")
+
+
+@dataclass
+class CachedResult:
+    data: bytes
+    ext: str
+
+
+class MemoryTierBase:
+    def __init__(self, capacity: int):
+        self._capacity = capacity
+        self._entries: OrderedDict[str, CachedResult] = OrderedDict()
+        self._size = 0
+
+    def _evict(self, required_size: int):
+        while self._entries and self._size + required_size > self._capacity:
+            _, result = self._entries.popitem(last=False)
+            self._size -= len(result.data)
+
+    def _get(self, key: str) -> Union[CachedResult, None]:
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+        return result
+
+    def _put(self, key: str, result: CachedResult):
+        if len(result.data) > self._capacity:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous.data)
+        self._evict(len(result.data))
+        self._entries[key] = result
+        self._size += len(result.data)
+
+
+class DiskTierBase:
+    def __init__(self, directory: str, capacity: int):
+        self._directory = directory
+        self._capacity = capacity
+        # Maps keys to (filename, size), ordered from least to most recently used
+        self._entries: Union[OrderedDict[str, tuple[str, int]], None] = None
+        self._size = 0
+
+    def _get_path(self, filename: str) -> str:
+        return os.path.join(self._directory, filename)
+
+    def _load_entries(self) -> OrderedDict[str, tuple[str, int]]:
+        """
+        Indexes the cache directory once, so entries survive restarts. Files
+        left behind by writes interrupted before their rename are deleted.
+        """
+        if self._entries is not None:
+            return self._entries
+
+        os.makedirs(self._directory, exist_ok=True)
+        files = []
+        for dir_entry in os.scandir(self._directory):
+            if not dir_entry.is_file():
+                continue
+            if dir_entry.name.endswith(".tmp"):
+                self._remove_file(dir_entry.path)
+                continue
+            stat = dir_entry.stat()
+            files.append((stat.st_mtime, dir_entry.name, stat.st_size))
+
+        self._entries = OrderedDict()
+        for _, filename, size in sorted(files):
+            key = filename.split(".", 1)[0]
+            self._entries[key] = (filename, size)
+            self._size += size
+        return self._entries
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _remove(self, key: str):
+        entries = self._load_entries()
+        filename, size = entries.pop(key)
+        self._size -= size
+        self._remove_file(self._get_path(filename))
+
+    def _evict(self, required_size: int):
+        entries = self._load_entries()
+        while entries and self._size + required_size > self._capacity:
+            self._remove(next(iter(entries)))
+
+    def _get(self, key: str) -> Union[CachedResult, None]:
+        entries = self._load_entries()
+        entry = entries.get(key)
+        if entry is None:
+            return None
+
+        filename, _ = entry
+        path = self._get_path(filename)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            os.utime(path)
+        except OSError:
+            self._remove(key)
+            return None
+
+        entries.move_to_end(key)
+        ext = filename.split(".", 1)[1]
+        return CachedResult(data=data, ext=ext)
+
+    def _put(self, key: str, result: CachedResult):
+        if len(result.data) > self._capacity:
+            return
+        entries = self._load_entries()
+        if key in entries:
+            self._remove(key)
+        self._evict(len(result.data))
+
+        filename = f"{key}.{result.ext}"
+        path = self._get_path(filename)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(result.data)
+        os.replace(tmp_path, path)
+
+        entries[key] = (filename, len(result.data))
+        self._size += len(result.data)
+
+
+class MemoryTier(MemoryTierBase):
+    """In-memory LRU of results bounded by their total size in bytes."""
+
+    def __init__(self, capacity: int):
+        super().__init__(capacity)
+
+    def get(self, key: str) -> Union[CachedResult, None]:
+        return self._get(key)
+
+    def put(self, key: str, result: CachedResult):
+        self._put(key, result)
+
+
+class DiskTier(DiskTierBase):
+    """On-disk LRU of results, evicted by size from the least recently used."""
+
+    def __init__(self, directory: str, capacity: int):
+        super().__init__(directory, capacity)
+
+    def get(self, key: str) -> Union[CachedResult, None]:
+        return self._get(key)
+
+    def put(self, key: str, result: CachedResult):
+        self._put(key, result)
+
+
+class ResultCacheBase:
+    def __init__(self):
+        self._memory_tier = MemoryTier(RESULT_CACHE_MEMORY_MB * 1024 * 1024)
+        self._disk_tier = DiskTier(
+            RESULT_CACHE_DIRECTORY, RESULT_CACHE_DISK_MB * 1024 * 1024
+        )
+        self._lock = threading.Lock()
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _create_key(data: memoryview, params: dict[str, str]) -> str:
+        key_hash = hashlib.sha256(data)
+        for name, value in sorted(params.items()):
+            key_hash.update(f"\0{name}={value}".encode())
+        return key_hash.hexdigest()
+
+    def _get(self, key: str) -> Union[CachedResult, None]:
+        with self._lock:
+            result = self._memory_tier.get(key)
+            if result is not None:
+                self._memory_hits += 1
+                return result
+
+            try:
+                result = self._disk_tier.get(key)
+            except OSError as error:
+                logger.log(logging.WARNING, f"Result cache read failed: {error}")
+                result = None
+
+            if result is not None:
+                self._disk_hits += 1
+                self._memory_tier.put(key, result)
+                return result
+
+            self._misses += 1
+            return None
+
+    def _put(self, key: str, result: CachedResult):
+        with self._lock:
+            self._memory_tier.put(key, result)
+            try:
+                self._disk_tier.put(key, result)
+            except OSError as error:
+                logger.log(logging.WARNING, f"Result cache write failed: {error}")
+
+
+class ResultCache(ResultCacheBase):
+    """
+    Content-addressed cache of processed media. Results are keyed by the hash
+    of the input bytes and the processing parameters, and kept in a memory
+    tier backed by a disk tier which survives restarts.
+    """
+
+    def __init__(self):
+        pass  # For Singleton class to work properly
+
+    def __new__(cls, *args, **kwargs):
+        if not hasattr(cls, "instance") or not isinstance(cls.instance, cls):
+            cls.instance = super(ResultCache, cls).__new__(cls)
+            super(cls, cls.instance).__init__(*args, **kwargs)
+        return cls.instance
+
+    def create_key(self, data: memoryview, params: dict[str, str]) -> str:
+        return self._create_key(data, params)
+
+    def get(self, key: str) -> Union[CachedResult, None]:
+        """Returns the cached result, or None on a miss. Performs disk I/O."""
+        return self._get(key)
+
+    def put(self, key: str, result: CachedResult):
+        """Stores the result in both tiers. Performs disk I/O."""
+        self._put(key, result)
+
+    def get_stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+            }
@@ -1,10 +1,13 @@
 from PIL.Image import Image as ImageType
 from fractions import Fraction
 from dataclasses import dataclass
+from typing import Iterator, Union
 from abc import ABC
 
 
 class AbstractFrame(ABC):
+    __slots__ = ()
+
     image: ImageType
     width: int
     height: int
@@ -85,6 +88,46 @@ class ImageData(AbstractData):
     total_duration: Fraction
 
 
+@dataclass
+class StreamData:
+    """Multi-frame media whose frames are decoded lazily while iterating."""
+
+    frames: Iterator[AbstractFrame]
+    framecount: int
+    width: int
+    height: int
+
+
+@dataclass
+class VideoProbe:
+    """Video properties read from the container and stream headers only."""
+
+    width: int
+    height: int
+    framecount: int
+    duration: Fraction
+    codec: str
+
+
+@dataclass
+class EncodePlan:
+    """Reductions applied to the frames of a result before encoding."""
+
+    colors: int = 255
+    scale: float = 1.0
+    frame_step: int = 1
+
+
+@dataclass
+class RemoteFileProbe:
+    """File properties read from the headers and first bytes of a response."""
+
+    mime_type: str
+    size: Union[int, None]
+    width: Union[int, None]
+    height: Union[int, None]
+
+
 @dataclass
 class MimeTypeConfig:
     def __init__(self):
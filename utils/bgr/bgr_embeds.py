@@ -1,3 +1,5 @@
+import asyncio
+
 from nextcord import Message
 from nextcord.ext.commands import Context
 
@@ -11,6 +13,11 @@ class IteratorBase:
     def __init__(self, ctx: Context):
         self._ctx = ctx
         self._message: Union[Message, None] = None
+        self._started = False
+        self._closed = False
+        # Queue positions are sent from tasks, sends are serialized so one in
+        # flight has set the message before the next send or clean uses it
+        self._lock = asyncio.Lock()
 
     @staticmethod
     def _initial_embed_form() -> EmbedForm:
@@ -18,6 +25,12 @@ class IteratorBase:
         embed_form.set_description("Initializing..")
         return embed_form
 
+    @staticmethod
+    def _queued_embed_form(position: int) -> EmbedForm:
+        embed_form = EmbedForm().set_white()
+        embed_form.set_description(f"Queued at position {position}.")
+        return embed_form
+
     @staticmethod
     def _iteration_embed_form(idx: int, total_idx: int, image_io: BytesIO) -> EmbedForm:
         description = f"Processed {idx} out of {total_idx} frames."
@@ -29,6 +42,7 @@ class IteratorBase:
     async def _remove_message(self):
         if self._message:
             await self._message.delete()
+            self._message = None
 
     async def _send_embed(self, embed_form: EmbedForm):
         if not self._message:
@@ -38,13 +52,30 @@ class IteratorBase:
 
 
 class EmbedImageIterator(IteratorBase):
+    async def queued(self, position: int):
+        async with self._lock:
+            # Position updates may arrive after the job started or finished
+            if self._started or self._closed:
+                return
+            embed_form = self._queued_embed_form(position)
+            await self._send_embed(embed_form)
+
     async def send(self):
-        embed_form = self._initial_embed_form()
-        await self._send_embed(embed_form)
+        async with self._lock:
+            self._started = True
+            if self._closed:
+                return
+            embed_form = self._initial_embed_form()
+            await self._send_embed(embed_form)
 
     async def update(self, idx: int, total_idx: int, image_io: BytesIO):
-        embed_form = self._iteration_embed_form(idx, total_idx, image_io)
-        await self._send_embed(embed_form)
+        async with self._lock:
+            if self._closed:
+                return
+            embed_form = self._iteration_embed_form(idx, total_idx, image_io)
+            await self._send_embed(embed_form)
 
     async def clean(self):
-        await self._remove_message()
+        async with self._lock:
+            self._closed = True
+            await self._remove_message()
@@ -0,0 +1,578 @@
+import os
+import time
+import numpy as np
+
+from io import BytesIO
+from abc import ABC, abstractmethod
+from functools import partial
+from fractions import Fraction
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Union
+from PIL import Image
+from PIL.Image import Image as ImageType
+
+from utils.bgr.bgr_media import ComposeGIF
+from utils.bgr.bgr_frames import StoredFrame
+from utils.bgr.bgr_budget import OutputBudget
+from utils.bgr.bgr_palette import PaletteQuantizer, GIFWriter
+from utils.bgr.bgr_dataclasses import AbstractFrame, ImageFrame, EncodePlan
+from exceptions.media_exceptions import ExceedsUploadLimit, NoFramesToEncode
+from logger.metrics_logging import MetricsLogger
+from configuration.command_variables.bgr_variables import (
+    WEBP_QUALITY,
+    WEBP_METHOD,
+    GIF_ENCODER,
+    GIF_ALPHA_THRESHOLD,
+    ENCODE_WORKERS,
+    STILL_ENCODE_MODE,
+    STILL_CROP,
+    STILL_CROP_PADDING,
+)
+
+
+class OutputEncoder(ABC):
+    """
+    Encodes processed frames into a file. Frames are encoded as they leave
+    the pipeline, finalize completes the file. When a budget is set and the
+    file is over it, the frames are encoded once more with a reduced plan.
+    """
+
+    name: str = ""
+    ext: str = ""
+    # Whether the size of the palette is a choice of the encoder
+    palette: bool = False
+
+    def __init__(self):
+        # Only kept for a re-plan, so only when a budget is set
+        self._frames: list[AbstractFrame] = []
+        self._framecount = 0
+        self._budget: Union[OutputBudget, None] = None
+        self._plan = EncodePlan()
+        self._attempts = 0
+        self._encode_time = 0.0
+
+    @abstractmethod
+    def _start(self, plan: EncodePlan):
+        """Begins a new file following the plan."""
+
+    @abstractmethod
+    def _add_frame(self, frame: AbstractFrame):
+        """Encodes the next frame of the file."""
+
+    @abstractmethod
+    def _finish(self) -> BytesIO:
+        """Completes the file from the frames added since _start."""
+
+    def _encode(self, frames: list[AbstractFrame], plan: EncodePlan) -> BytesIO:
+        self._start(plan)
+        for frame in frames:
+            self._add_frame(frame)
+        return self._finish()
+
+    @staticmethod
+    def _get_size(output_io: BytesIO) -> int:
+        return output_io.getbuffer().nbytes
+
+    @staticmethod
+    def _plan_frame(
+        frame: AbstractFrame, duration: Fraction, scale: float
+    ) -> AbstractFrame:
+        if scale >= 1:
+            if isinstance(frame, StoredFrame):
+                return StoredFrame(frame.store, frame.index, duration)
+            return ImageFrame(
+                image=frame.image,
+                width=frame.width,
+                height=frame.height,
+                duration=duration,
+            )
+
+        width = max(1, round(frame.width * scale))
+        height = max(1, round(frame.height * scale))
+        image = frame.image.resize((width, height), Image.LANCZOS)
+        return ImageFrame(image=image, width=width, height=height, duration=duration)
+
+    def _plan_frames(self, plan: EncodePlan) -> list[AbstractFrame]:
+        """Keeps every frame_step-th frame for the whole step, then scales."""
+        frames = []
+        for idx in range(0, len(self._frames), plan.frame_step):
+            step_frames = self._frames[idx : idx + plan.frame_step]
+            duration = sum((frame.duration for frame in step_frames), Fraction(0))
+            frames.append(self._plan_frame(step_frames[0], duration, plan.scale))
+        return frames
+
+    def _encode_planned(self, plan: EncodePlan) -> BytesIO:
+        self._plan = plan
+        self._attempts += 1
+        return self._encode(self._plan_frames(plan), plan)
+
+    def _fit_budget(self, output_io: BytesIO) -> BytesIO:
+        """Re-encodes at most once, with a plan reduced from the actual size."""
+        if not self._budget:
+            return output_io
+        size = self._get_size(output_io)
+        if self._budget.fits(size):
+            return output_io
+
+        plan = self._budget.plan(size, self._framecount, self._plan, self.palette)
+        if plan != self._plan:
+            output_io = self._encode_planned(plan)
+            if self._budget.fits(self._get_size(output_io)):
+                return output_io
+        raise ExceedsUploadLimit(self._budget.get_max_bytes())
+
+    def _log_metrics(self, output_io: BytesIO):
+        metrics = MetricsLogger("encode")
+        metrics.add("format", self.name)
+        metrics.add("frames", self._framecount)
+        metrics.add("seconds", self._encode_time)
+        metrics.add("bytes", self._get_size(output_io))
+        metrics.add("attempts", self._attempts)
+        metrics.add("colors", self._plan.colors)
+        metrics.add("scale", self._plan.scale)
+        metrics.add("frame_step", self._plan.frame_step)
+        self._add_metrics(metrics)
+        metrics.log()
+
+    def _add_metrics(self, metrics: MetricsLogger):
+        """Adds metrics specific to the encoder."""
+
+    def get_extension(self) -> str:
+        return self.ext
+
+    def set_budget(self, budget: OutputBudget):
+        self._budget = budget
+
+    def append(self, frame: AbstractFrame):
+        start_time = time.perf_counter()
+        if not self._framecount:
+            self._attempts += 1
+            self._start(self._plan)
+        self._add_frame(frame)
+        self._encode_time += time.perf_counter() - start_time
+
+        self._framecount += 1
+        if self._budget:
+            self._frames.append(frame)
+
+    def finalize(self) -> BytesIO:
+        if not self._framecount:
+            raise NoFramesToEncode()
+        start_time = time.perf_counter()
+        output_io = self._fit_budget(self._finish())
+        self._encode_time += time.perf_counter() - start_time
+        self._log_metrics(output_io)
+        self._frames.clear()
+        output_io.seek(0)
+        return output_io
+
+
+class MagickGIFEncoder(OutputEncoder):
+    """GIF through ImageMagick, with 256 colours and 1-bit transparency."""
+
+    name = "gif"
+    ext = "gif"
+
+    def __init__(self):
+        super().__init__()
+        self._composer: Union[ComposeGIF, None] = None
+
+    def _start(self, plan: EncodePlan):
+        self._composer = ComposeGIF()
+
+    def _add_frame(self, frame: AbstractFrame):
+        self._composer.append(frame)
+
+    def _finish(self) -> BytesIO:
+        return self._composer.finalize()
+
+
+class PaletteGIFEncoderBase(OutputEncoder):
+    palette = True
+    sample_frames = 8
+
+    def __init__(self):
+        super().__init__()
+        self._colors = EncodePlan().colors
+        self._sample: list[AbstractFrame] = []
+        self._quantizer: Union[PaletteQuantizer, None] = None
+        self._writer: Union[GIFWriter, None] = None
+        self._executor: Union[ThreadPoolExecutor, None] = None
+        self._quantized: deque[tuple[Future, Fraction]] = deque()
+        self._encoded: deque[Future] = deque()
+        # The last distinct frame, written once the frame after it is known
+        self._last: Union[tuple[np.ndarray, Fraction], None] = None
+        self._canvas: Union[np.ndarray, None] = None
+
+    @staticmethod
+    def _frame_array(frame: AbstractFrame) -> np.ndarray:
+        if isinstance(frame, StoredFrame):
+            return frame.array
+        image = frame.image
+        if image.mode != "RGBA":
+            image = image.convert("RGBA")
+        return np.asarray(image)
+
+    @staticmethod
+    def _get_duration_ms(duration: Fraction) -> int:
+        return int(duration * 1000)
+
+    @staticmethod
+    def _get_bounding_box(
+        mask: np.ndarray,
+    ) -> Union[tuple[int, int, int, int], None]:
+        """Returns (x0, y0, x1, y1) of the set pixels of a 2D mask, or None."""
+        rows = np.flatnonzero(mask.any(axis=1))
+        if not len(rows):
+            return None
+        columns = np.flatnonzero(mask.any(axis=0))
+        return int(columns[0]), int(rows[0]), int(columns[-1]) + 1, int(rows[-1]) + 1
+
+    @staticmethod
+    def _union_boxes(
+        box: Union[tuple[int, int, int, int], None],
+        other: tuple[int, int, int, int],
+    ) -> tuple[int, int, int, int]:
+        if box is None:
+            return other
+        return (
+            min(box[0], other[0]),
+            min(box[1], other[1]),
+            max(box[2], other[2]),
+            max(box[3], other[3]),
+        )
+
+    def _fit_palette(
+        self, frames: list[AbstractFrame], colors: int
+    ) -> PaletteQuantizer:
+        count = len(frames)
+        sample_count = min(count, self.sample_frames)
+        sample_idxs = np.unique(np.linspace(0, count - 1, sample_count).round())
+        arrays = [self._frame_array(frames[int(idx)]) for idx in sample_idxs]
+        quantizer = PaletteQuantizer(GIF_ALPHA_THRESHOLD, colors)
+        quantizer.fit(arrays)
+        return quantizer
+
+    @staticmethod
+    def _get_workers() -> int:
+        return ENCODE_WORKERS or os.cpu_count() or 1
+
+    def _quantize_frame(
+        self, quantizer: PaletteQuantizer, frame: AbstractFrame
+    ) -> np.ndarray:
+        return quantizer.quantize(self._frame_array(frame))
+
+    def _start(self, plan: EncodePlan):
+        self._colors = plan.colors
+        self._sample = []
+        self._quantizer = None
+        self._writer = None
+        self._executor = ThreadPoolExecutor(self._get_workers())
+        self._quantized.clear()
+        self._encoded.clear()
+        self._last = None
+        self._canvas = None
+
+    def _set_quantizer(self, quantizer: PaletteQuantizer, width: int, height: int):
+        self._quantizer = quantizer
+        self._writer = GIFWriter(width, height, quantizer.get_palette())
+
+    def _start_sampled(self):
+        """Fits the palette to the frames held back, then submits them."""
+        first_frame = self._sample[0]
+        quantizer = self._fit_palette(self._sample, self._colors)
+        self._set_quantizer(quantizer, first_frame.width, first_frame.height)
+        for frame in self._sample:
+            self._submit_frame(frame)
+        self._sample.clear()
+
+    def _submit_frame(self, frame: AbstractFrame):
+        quantize = partial(self._quantize_frame, self._quantizer, frame)
+        self._quantized.append((self._executor.submit(quantize), frame.duration))
+        self._collect(self._get_workers())
+
+    def _collect(self, pending: int):
+        """
+        Takes the finished frames in order, and waits for the oldest while
+        more than pending frames are in flight.
+        """
+        while len(self._quantized) > pending or (
+            self._quantized and self._quantized[0][0].done()
+        ):
+            future, duration = self._quantized.popleft()
+            self._add_indexed(future.result(), duration)
+
+        while len(self._encoded) > pending or (
+            self._encoded and self._encoded[0].done()
+        ):
+            self._writer.add_encoded_frame(self._encoded.popleft().result())
+
+    def _add_indexed(self, indices: np.ndarray, duration: Fraction):
+        """Merges frames that became equal once quantized."""
+        if self._last is not None:
+            last_indices, last_duration = self._last
+            if np.array_equal(indices, last_indices):
+                self._last = (last_indices, last_duration + duration)
+                return
+            self._submit_region(last_indices, last_duration, indices)
+        self._last = (indices, duration)
+
+    def _submit_region(
+        self,
+        indices: np.ndarray,
+        duration: Fraction,
+        following: Union[np.ndarray, None],
+    ):
+        region = self._get_region(indices, duration, following)
+        self._encoded.append(self._executor.submit(self._writer.encode_frame, *region))
+
+    def _get_region(
+        self,
+        indices: np.ndarray,
+        duration: Fraction,
+        following: Union[np.ndarray, None],
+    ) -> tuple[np.ndarray, tuple[int, int], int, int]:
+        """
+        Returns the rectangle that changed since the previous frame, with the
+        unchanged pixels inside it left transparent. A frame is cleared with
+        disposal 2 when the following one turns some of its pixels
+        transparent, otherwise it stays on the canvas with disposal 1.
+        """
+        transparent = self._quantizer.get_transparent_index()
+        canvas = self._canvas
+        if canvas is None:
+            canvas = np.full(indices.shape, transparent, dtype=np.uint8)
+
+        box = self._get_bounding_box(indices != canvas)
+        disposal = 1
+        if following is not None:
+            vanishing = (indices != transparent) & (following == transparent)
+            vanishing_box = self._get_bounding_box(vanishing)
+            if vanishing_box:
+                disposal = 2
+                box = self._union_boxes(box, vanishing_box)
+
+        x0, y0, x1, y1 = box or (0, 0, 1, 1)
+        region = indices[y0:y1, x0:x1].copy()
+        region[region == canvas[y0:y1, x0:x1]] = transparent
+
+        self._canvas = indices
+        if disposal == 2:
+            self._canvas = indices.copy()
+            self._canvas[y0:y1, x0:x1] = transparent
+        return region, (x0, y0), self._get_duration_ms(duration), disposal
+
+    def _add_frame(self, frame: AbstractFrame):
+        """
+        The first sample_frames frames are held back to fit the palette.
+        Later frames are quantized and LZW coded across the thread pool as
+        they arrive, only the file is assembled in order.
+        """
+        if self._quantizer:
+            self._submit_frame(frame)
+            return
+        self._sample.append(frame)
+        if len(self._sample) >= self.sample_frames:
+            self._start_sampled()
+
+    def _finish(self) -> BytesIO:
+        if not self._quantizer:
+            self._start_sampled()
+        try:
+            self._collect(0)
+            if self._last is not None:
+                self._submit_region(*self._last, None)
+            self._collect(0)
+        finally:
+            self._executor.shutdown()
+        return self._writer.finalize()
+
+    def _encode(self, frames: list[AbstractFrame], plan: EncodePlan) -> BytesIO:
+        # All frames are known on a re-plan, so the palette is fitted to a
+        # sample spread over the whole animation
+        self._start(plan)
+        first_frame = frames[0]
+        quantizer = self._fit_palette(frames, plan.colors)
+        self._set_quantizer(quantizer, first_frame.width, first_frame.height)
+        for frame in frames:
+            self._submit_frame(frame)
+        return self._finish()
+
+
+class PaletteGIFEncoder(PaletteGIFEncoderBase):
+    """
+    GIF with one global palette built from a sample of the frames. Each
+    frame only stores the rectangle which changed since the previous one.
+    """
+
+    name = "gif"
+    ext = "gif"
+
+    def __init__(self):
+        super().__init__()
+
+
+class PillowAnimationEncoderBase(OutputEncoder):
+    def __init__(self):
+        super().__init__()
+        self._images: list[ImageType] = []
+        self._durations: list[int] = []
+
+    @staticmethod
+    def _get_duration_ms(frame: AbstractFrame) -> int:
+        return max(1, int(frame.duration * 1000))
+
+    @abstractmethod
+    def _get_save_params(self) -> dict:
+        """Format specific parameters of Image.save."""
+
+    def _start(self, plan: EncodePlan):
+        self._images = []
+        self._durations = []
+
+    def _add_frame(self, frame: AbstractFrame):
+        # Images of stored frames are views of the frame store, not copies
+        self._images.append(frame.image)
+        self._durations.append(self._get_duration_ms(frame))
+
+    def _finish(self) -> BytesIO:
+        """Pillow only encodes a whole sequence, so the frames are saved here."""
+        first_image, *append_images = self._images
+        output_io = BytesIO()
+        first_image.save(
+            output_io,
+            save_all=True,
+            append_images=append_images,
+            duration=self._durations,
+            loop=0,
+            **self._get_save_params(),
+        )
+        self._images.clear()
+        return output_io
+
+
+class WebPEncoder(PillowAnimationEncoderBase):
+    """Animated WebP with a full alpha channel, lossy at WEBP_QUALITY."""
+
+    name = "webp"
+    ext = "webp"
+    lossless = False
+
+    def _get_save_params(self) -> dict:
+        return {
+            "format": "WEBP",
+            "lossless": self.lossless,
+            "quality": WEBP_QUALITY,
+            "method": WEBP_METHOD,
+            "background": (0, 0, 0, 0),
+        }
+
+
+class WebPLosslessEncoder(WebPEncoder):
+    """Animated WebP which keeps the pixels exactly."""
+
+    name = "webp_lossless"
+    lossless = True
+
+
+class APNGEncoder(PillowAnimationEncoderBase):
+    """Animated PNG, lossless with a full alpha channel."""
+
+    name = "apng"
+    ext = "png"
+
+    def _get_save_params(self) -> dict:
+        # Each frame replaces the region it covers, so transparent pixels
+        # do not reveal the previous frame
+        return {
+            "format": "PNG",
+            "disposal": 0,
+            "blend": 0,
+        }
+
+
+class StillEncoderBase(OutputEncoder):
+    # Pillow settings of each STILL_ENCODE_MODE, from fastest to smallest
+    modes: dict[str, tuple[str, dict]] = {
+        "fast": ("png", {"format": "PNG", "compress_level": 1}),
+        "balanced": ("png", {"format": "PNG", "compress_level": 6}),
+        "small": ("webp", {"format": "WEBP", "lossless": True, "method": 4}),
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.ext, self._save_params = self.modes[STILL_ENCODE_MODE]
+        self._image: Union[ImageType, None] = None
+        self._canvas_size = (0, 0)
+        self._cropped_size = (0, 0)
+
+    @staticmethod
+    def _get_crop_box(image: ImageType) -> Union[tuple[int, int, int, int], None]:
+        """Bounding box of the visible pixels, grown by STILL_CROP_PADDING."""
+        if image.mode != "RGBA":
+            return None
+        box = image.getchannel("A").getbbox()
+        if not box:
+            return None
+        x0, y0, x1, y1 = box
+        padding = STILL_CROP_PADDING
+        return (
+            max(0, x0 - padding),
+            max(0, y0 - padding),
+            min(image.width, x1 + padding),
+            min(image.height, y1 + padding),
+        )
+
+    def _crop(self, image: ImageType) -> ImageType:
+        self._canvas_size = image.size
+        if STILL_CROP:
+            crop_box = self._get_crop_box(image)
+            if crop_box and crop_box != (0, 0, *image.size):
+                image = image.crop(crop_box)
+        self._cropped_size = image.size
+        return image
+
+    def _start(self, plan: EncodePlan):
+        self._image = None
+
+    def _add_frame(self, frame: AbstractFrame):
+        if self._image is None:
+            self._image = self._crop(frame.image)
+
+    def _finish(self) -> BytesIO:
+        output_io = BytesIO()
+        self._image.save(output_io, **self._save_params)
+        return output_io
+
+    def _add_metrics(self, metrics: MetricsLogger):
+        canvas_width, canvas_height = self._canvas_size
+        width, height = self._cropped_size
+        cropped_pixels = canvas_width * canvas_height - width * height
+        metrics.add("mode", STILL_ENCODE_MODE)
+        metrics.add("size", f"{width}x{height}")
+        metrics.add("cropped_raw_bytes", cropped_pixels * 4)
+
+
+class StillEncoder(StillEncoderBase):
+    """
+    Single-frame results, cropped to the visible subject and encoded as PNG
+    or lossless WebP depending on STILL_ENCODE_MODE.
+    """
+
+    name = "still"
+
+    def __init__(self):
+        super().__init__()
+
+
+GIFEncoder = PaletteGIFEncoder if GIF_ENCODER == "palette" else MagickGIFEncoder
+
+OUTPUT_ENCODERS: dict[str, type[OutputEncoder]] = {
+    encoder.name: encoder
+    for encoder in (GIFEncoder, WebPEncoder, WebPLosslessEncoder, APNGEncoder)
+}
+
+
+def create_encoder(output_format: str) -> OutputEncoder:
+    return OUTPUT_ENCODERS[output_format]()
@@ -0,0 +1,204 @@
+import os
+import numpy as np
+import onnxruntime as ort
+
+from abc import ABC, abstractmethod
+from PIL import Image
+from PIL.Image import Image as ImageType
+from fractions import Fraction
+
+from rembg.session_base import BaseSession
+from rembg.session_factory import new_session
+from rembg.session_simple import SimpleSession
+
+from utils.bgr.bgr_remove import BGRemoveBatch, apply_mask
+from utils.bgr.bgr_frames import StoredFrame
+from utils.bgr.bgr_models import ModelStore
+from utils.bgr.bgr_dataclasses import AbstractFrame, ImageFrame
+from configuration.command_variables.bgr_variables import (
+    ONNX_INTRA_OP_THREADS,
+    ONNX_INTER_OP_THREADS,
+    ONNX_GRAPH_OPTIMIZATION,
+    ONNX_MEMORY_ARENA,
+)
+
+GRAPH_OPTIMIZATION_LEVELS: dict[str, ort.GraphOptimizationLevel] = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
+class RemovalEngine(ABC):
+    """
+    Removes the background of batches of frames with one model. Frames are
+    modified in place and returned.
+    """
+
+    name: str = ""
+
+    def __init__(self, model_name: str):
+        self._model_name = model_name
+
+    def _get_model_path(self) -> str:
+        return ModelStore().get_model_path(self._model_name)
+
+    def get_model_name(self) -> str:
+        return self._model_name
+
+    def get_memory_size(self) -> int:
+        """Approximates the memory footprint of the engine by its model file size."""
+        model_path = self._get_model_path()
+        if os.path.isfile(model_path):
+            return os.path.getsize(model_path)
+        return 0
+
+    @abstractmethod
+    def remove_background(self, frames: list[AbstractFrame]) -> list[AbstractFrame]:
+        """Removes the background of the frames and returns them."""
+
+    def warm_up(self):
+        """Runs a dummy inference so the first job does not pay for it."""
+        dummy_image = Image.new("RGB", (32, 32))
+        dummy_frame = ImageFrame(
+            image=dummy_image, width=32, height=32, duration=Fraction(0)
+        )
+        self.remove_background([dummy_frame])
+
+
+class RembgEngine(RemovalEngine):
+    """Runs the models through rembg sessions."""
+
+    name = "rembg"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        self._session: BaseSession = self._create_session()
+
+    def _create_session(self) -> BaseSession:
+        model_store = ModelStore()
+        if not model_store.is_batchable(self._model_name):
+            return new_session(self._model_name)
+
+        # rembg only loads the published model files, the batched copy of the
+        # model or of its quantization is loaded here
+        model_path = model_store.ensure_batched_model(self._model_name)
+        inner_session = ort.InferenceSession(
+            model_path, providers=["CPUExecutionProvider"]
+        )
+        return SimpleSession(self._model_name, inner_session)
+
+    def remove_background(self, frames: list[AbstractFrame]) -> list[AbstractFrame]:
+        return BGRemoveBatch(frames, self._session).remove_background()
+
+
+class ONNXEngineBase(RemovalEngine):
+    # Normalization of the u2net family of models, as done by rembg
+    mean = np.array((0.485, 0.456, 0.406), dtype=np.float32)
+    std = np.array((0.229, 0.224, 0.225), dtype=np.float32)
+    input_size = (320, 320)
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        self._session = self._create_session()
+        model_input = self._session.get_inputs()[0]
+        self._input_name = model_input.name
+        # Models exported with a fixed batch dimension run one frame at a time
+        self._batching = not isinstance(model_input.shape[0], int)
+
+    @staticmethod
+    def _create_session_options() -> ort.SessionOptions:
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = ONNX_INTRA_OP_THREADS
+        options.inter_op_num_threads = ONNX_INTER_OP_THREADS
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[
+            ONNX_GRAPH_OPTIMIZATION
+        ]
+        options.enable_cpu_mem_arena = ONNX_MEMORY_ARENA
+        return options
+
+    def _get_session_path(self) -> str:
+        model_store = ModelStore()
+        if model_store.is_batchable(self._model_name):
+            return model_store.ensure_batched_model(self._model_name)
+        return model_store.ensure_model(self._model_name)
+
+    def _create_session(self) -> ort.InferenceSession:
+        return ort.InferenceSession(
+            self._get_session_path(),
+            sess_options=self._create_session_options(),
+            providers=["CPUExecutionProvider"],
+        )
+
+    def _prepare_input(self, frame: AbstractFrame) -> np.ndarray:
+        image = frame.image.convert("RGB").resize(self.input_size, Image.LANCZOS)
+        return np.asarray(image, dtype=np.float32)
+
+    def _normalize(self, inputs: np.ndarray) -> np.ndarray:
+        """Scales each image by its maximum, then standardizes it to NCHW."""
+        maxima = inputs.max(axis=(1, 2, 3), keepdims=True)
+        inputs /= np.maximum(maxima, 1e-6)
+        inputs -= self.mean
+        inputs /= self.std
+        return np.ascontiguousarray(inputs.transpose(0, 3, 1, 2))
+
+    def _run(self, batch: np.ndarray) -> np.ndarray:
+        if self._batching:
+            return self._session.run(None, {self._input_name: batch})[0][:, 0]
+
+        predictions = [
+            self._session.run(None, {self._input_name: batch[idx : idx + 1]})[0]
+            for idx in range(len(batch))
+        ]
+        return np.concatenate(predictions)[:, 0]
+
+    @staticmethod
+    def _scale_predictions(predictions: np.ndarray) -> np.ndarray:
+        minima = predictions.min(axis=(1, 2), keepdims=True)
+        ranges = predictions.max(axis=(1, 2), keepdims=True) - minima
+        ranges[ranges == 0] = 1
+        return ((predictions - minima) / ranges * 255).astype(np.uint8)
+
+    @staticmethod
+    def _resize_mask(mask: np.ndarray, frame: AbstractFrame) -> np.ndarray:
+        mask_image: ImageType = Image.fromarray(mask)
+        mask_image = mask_image.resize((frame.width, frame.height), Image.LANCZOS)
+        return np.asarray(mask_image)
+
+    @staticmethod
+    def _apply_mask(frame: AbstractFrame, mask: np.ndarray):
+        if isinstance(frame, StoredFrame):
+            apply_mask(frame.array, mask)
+            return
+        array = np.array(frame.image.convert("RGBA"))
+        apply_mask(array, mask)
+        frame.image = Image.fromarray(array)
+
+    def _remove_background(self, frames: list[AbstractFrame]) -> list[AbstractFrame]:
+        inputs = np.stack([self._prepare_input(frame) for frame in frames])
+        masks = self._scale_predictions(self._run(self._normalize(inputs)))
+        for frame, mask in zip(frames, masks):
+            self._apply_mask(frame, self._resize_mask(mask, frame))
+        return frames
+
+
+class ONNXEngine(ONNXEngineBase):
+    """
+    Runs the u2net family of models on onnxruntime directly. Frames are
+    normalized as one NumPy batch and masked in place in their buffers,
+    and the session options are set from the ONNX_* variables.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+
+    def remove_background(self, frames: list[AbstractFrame]) -> list[AbstractFrame]:
+        return self._remove_background(frames)
+
+
+REMOVAL_ENGINES: dict[str, type[RemovalEngine]] = {
+    engine.name: engine for engine in (RembgEngine, ONNXEngine)
+}
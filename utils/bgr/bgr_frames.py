@@ -0,0 +1,221 @@
+import logging
+import tempfile
+import threading
+import weakref
+import numpy as np
+
+from PIL import Image
+from PIL.Image import Image as ImageType
+from fractions import Fraction
+from typing import Union
+
+from utils.bgr.bgr_dataclasses import AbstractFrame
+from configuration.command_variables.bgr_variables import (
+    FRAME_MEMORY_PER_JOB_MB,
+    FRAME_MEMORY_GLOBAL_MB,
+    FRAME_SCRATCH_DIRECTORY,
+)
+
+logger = logging.getLogger("nextcord")
+
+
+class FrameMemoryBudgetBase:
+    def __init__(self):
+        self._job_limit = FRAME_MEMORY_PER_JOB_MB * 1024 * 1024
+        self._global_limit = FRAME_MEMORY_GLOBAL_MB * 1024 * 1024
+        self._in_use = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self, requested: int, reserved: int) -> int:
+        with self._lock:
+            available = max(0, self._global_limit - self._in_use)
+            job_available = max(0, self._job_limit - reserved)
+            granted = min(requested, job_available, available)
+            self._in_use += granted
+            return granted
+
+    def _release(self, granted: int):
+        with self._lock:
+            self._in_use -= granted
+
+
+class FrameMemoryBudget(FrameMemoryBudgetBase):
+    """Process-wide budget of RAM bytes held by frame stores."""
+
+    def __init__(self):
+        pass  # For Singleton class to work properly
+
+    def __new__(cls, *args, **kwargs):
+        if not hasattr(cls, "instance") or not isinstance(cls.instance, cls):
+            cls.instance = super(FrameMemoryBudget, cls).__new__(cls)
+            super(cls, cls.instance).__init__(*args, **kwargs)
+        return cls.instance
+
+    def reserve(self, requested: int, reserved: int = 0) -> int:
+        """
+        Reserves up to the requested bytes within the per-job and global
+        limits, and returns the number of bytes granted. Reserved is what the
+        job already holds.
+        """
+        return self._reserve(requested, reserved)
+
+    def release(self, granted: int):
+        self._release(granted)
+
+    def get_in_use(self) -> int:
+        return self._in_use
+
+
+class FrameStoreBase:
+    def __init__(self, count: int, width: int, height: int):
+        self._width = width
+        self._height = height
+        self._capacity = max(1, count)
+        self._frame_size = width * height * 4
+        # Frames are in RAM until the budget runs out, the rest are spilled
+        self._ram_count = self._capacity
+        self._ram_array = self._allocate(self._capacity)
+        self._spill_array: Union[np.ndarray, None] = None
+        self._reserved = [0]
+        weakref.finalize(self, self._release_reserved, self._reserved)
+        self._count = 0
+
+    @staticmethod
+    def _release_reserved(reserved: list[int]):
+        FrameMemoryBudget().release(reserved[0])
+
+    def _allocate(self, count: int) -> np.ndarray:
+        # The OS only commits the pages of the slots which are written
+        return np.empty((count, self._height, self._width, 4), dtype=np.uint8)
+
+    def _reserve_slot(self, index: int):
+        """Reserves RAM for a slot as it is filled, or spills it and the rest."""
+        if index >= self._ram_count:
+            return
+
+        budget = FrameMemoryBudget()
+        granted = budget.reserve(self._frame_size, self._reserved[0])
+        if granted == self._frame_size:
+            self._reserved[0] += granted
+            return
+
+        budget.release(granted)
+        self._ram_count = index
+        self._spill_array = self._allocate_spill(self._capacity - index)
+
+    def _allocate_spill(self, count: int) -> np.ndarray:
+        """Maps the frames beyond the budget onto an unlinked scratch file."""
+        scratch_file = tempfile.TemporaryFile(dir=FRAME_SCRATCH_DIRECTORY or None)
+        spill_array = np.memmap(
+            scratch_file,
+            dtype=np.uint8,
+            mode="w+",
+            shape=(count, self._height, self._width, 4),
+        )
+        # The mapping stays valid after the file object is closed
+        scratch_file.close()
+        logger.log(
+            logging.INFO,
+            f"Frame store spilled {count} of {self._capacity} frames to disk.",
+        )
+        return spill_array
+
+    def _next_index(self) -> int:
+        if self._count >= self._capacity:
+            raise IndexError("Frame store is full.")
+        index = self._count
+        self._reserve_slot(index)
+        self._count += 1
+        return index
+
+    def _get_array(self, index: int) -> np.ndarray:
+        if index < self._ram_count:
+            return self._ram_array[index]
+        if self._spill_array is None:
+            raise IndexError("Frame index out of range.")
+        return self._spill_array[index - self._ram_count]
+
+    def _get_image(self, index: int) -> ImageType:
+        # RGBA arrays are mapped by Pillow without copying, the image is
+        # read-only and copies itself if it is ever drawn on
+        return Image.fromarray(self._get_array(index))
+
+    def _set_image(self, index: int, image: ImageType):
+        if image.mode != "RGBA":
+            image = image.convert("RGBA")
+        if image.size != (self._width, self._height):
+            raise ValueError("Image does not match the frame store resolution.")
+        self._get_array(index)[...] = np.asarray(image)
+
+
+class FrameStore(FrameStoreBase):
+    """
+    (N, H, W, 4) uint8 buffer holding the RGBA pixels of the frames of one
+    job. Frames are records pointing into the buffer. Memory is reserved from
+    the budget slot by slot as frames are added, and frames beyond the budget
+    live in a memory-mapped scratch file, which the OS pages in when they are
+    accessed. Slots are kept until the store is released with the job.
+    """
+
+    def __init__(self, count: int, width: int, height: int):
+        super().__init__(count, width, height)
+
+    def get_resolution(self) -> tuple[int, int]:
+        return self._width, self._height
+
+    def get_spilled_count(self) -> int:
+        return self._capacity - self._ram_count
+
+    def add_array(self, array: np.ndarray, duration: Fraction) -> "StoredFrame":
+        """Copies an (H, W, 4) uint8 array into the next slot."""
+        index = self._next_index()
+        self._get_array(index)[...] = array
+        return StoredFrame(self, index, duration)
+
+    def add_image(self, image: ImageType, duration: Fraction) -> "StoredFrame":
+        """Copies an image into the next slot, converting it to RGBA if needed."""
+        index = self._next_index()
+        self._set_image(index, image)
+        return StoredFrame(self, index, duration)
+
+    def get_array(self, index: int) -> np.ndarray:
+        """Writable view of a slot."""
+        return self._get_array(index)
+
+    def get_image(self, index: int) -> ImageType:
+        """Read-only image sharing the memory of a slot."""
+        return self._get_image(index)
+
+    def set_image(self, index: int, image: ImageType):
+        self._set_image(index, image)
+
+
+class StoredFrame(AbstractFrame):
+    """Frame record referencing a slot of a FrameStore."""
+
+    __slots__ = ("store", "index", "duration")
+
+    def __init__(self, store: FrameStore, index: int, duration: Fraction):
+        self.store = store
+        self.index = index
+        self.duration = duration
+
+    @property
+    def width(self) -> int:
+        return self.store.get_resolution()[0]
+
+    @property
+    def height(self) -> int:
+        return self.store.get_resolution()[1]
+
+    @property
+    def array(self) -> np.ndarray:
+        return self.store.get_array(self.index)
+
+    @property
+    def image(self) -> ImageType:
+        return self.store.get_image(self.index)
+
+    @image.setter
+    def image(self, image: ImageType):
+        self.store.set_image(self.index, image)
@@ -4,37 +4,63 @@ import asyncio
 from PIL import Image
 from PIL.Image import Image as ImageType
 from io import BytesIO
-from typing import Union
+from typing import Union, Iterator, Type
 from uuid import uuid4
 
 
 from fractions import Fraction
 from nextcord.ext.commands import Context
 
-from utils.http_utils import ContextHTTPFile
+from utils.http_utils import ContextHTTPFile, MemoryViewIO
 from utils.bgr.bgr_utils import BGProcess
+from utils.bgr.bgr_pipeline import MediaPipeline
+from utils.bgr.bgr_embeds import EmbedImageIterator
+from utils.bgr.bgr_scheduler import JobScheduler
+from utils.bgr.bgr_cache import ResultCache, CachedResult
+from utils.bgr.bgr_encoders import create_encoder, StillEncoder
+from utils.bgr.bgr_budget import OutputBudget
+from utils.bgr.bgr_options import RequestOptions
+from logger.metrics_logging import MetricsLogger
 from logger.exception_logging import ExceptionLogger
+from exceptions.bot_exceptions import BaseBotException
 
 from configuration.command_variables.bgr_variables import (
     MAX_FRAMES,
     MAX_PX_IMAGE,
     MAX_PX_ANIMATED,
+    REMBG_MODEL,
+    MODEL_TIERS,
+    ANIMATED_MODEL_TIER,
+    MAX_VIDEO_DURATION,
+    DOWNSCALE_OVERSIZED,
+    MAX_FILE_SIZE_MB,
+    DEFAULT_UPLOAD_LIMIT_MB,
+    REMOVAL_ENGINE,
+    DEDUPE_DOWNSAMPLE,
+    GIF_ENCODER,
+    GIF_ALPHA_THRESHOLD,
+    WEBP_QUALITY,
+    WEBP_METHOD,
+    STILL_ENCODE_MODE,
+    STILL_CROP,
+    STILL_CROP_PADDING,
 )
 
 
 from utils.bgr.bgr_dataclasses import (
     MimeTypeConfig,
     ImageFrame,
-    AbstractData,
+    AbstractFrame,
     ImageData,
+    StreamData,
+    VideoProbe,
+    RemoteFileProbe,
 )
 
 
 from utils.bgr.bgr_media import (
-    ComposeGIF,
     VideoDecompose,
     AnimatedDecompose,
-    DisposeDuplicateFrames,
 )
 
 
@@ -45,30 +71,100 @@ from exceptions.media_exceptions import (
     ExceedsMaxFrames,
     ExceedsMaxResolution,
     SubceedsMinResolution,
+    ExceedsMaxDuration,
 )
 
 
 class MediaHandlerBase:
-    def __init__(self, ctx: Context, file: nextcord.File):
+    def __init__(self, ctx: Context, url: str, options: RequestOptions):
         self._ctx = ctx
-        self._file = file
+        self._url = url
+        self._options = options
         self._mime_config = MimeTypeConfig()
 
-    async def _validate_mime_type(self) -> str:
+    @staticmethod
+    def _validate_probe(probe: RemoteFileProbe):
+        """
+        Rejects images by the size in their header before they are downloaded.
+        Whether an image is animated is not known yet, so the larger limit
+        applies here and the exact one once the image is decoded.
+        """
+        if probe.width is None or probe.height is None:
+            return
+
+        fp_format = probe.mime_type.upper()
+        min_px = 32
+        max_px = max(MAX_PX_IMAGE, MAX_PX_ANIMATED)
+        width, height = probe.width, probe.height
+
+        if (width > max_px or height > max_px) and not DOWNSCALE_OVERSIZED:
+            raise ExceedsMaxResolution(fp_format, width, height, max_px)
+        if width < min_px or height < min_px:
+            raise SubceedsMinResolution(fp_format, width, height, min_px)
+
+    async def _get_file_buffer(self) -> tuple[memoryview, str]:
+        """
+        Probes the file by its headers and first bytes, then downloads it up
+        to MAX_FILE_SIZE_MB.
+        """
+        max_bytes = MAX_FILE_SIZE_MB * 1024 * 1024
         async with ContextHTTPFile() as cf:
-            mime_type = await cf.assert_mime_type_from_file(
-                self._file, self._mime_config
-            )
-        return mime_type
+            probe = await cf.probe_url(self._url, max_bytes, self._mime_config)
+            self._validate_probe(probe)
+            file_buffer = await cf.get_buffer_from_url(self._url, max_bytes)
+        return file_buffer, probe.mime_type
+
+    def _get_upload_limit(self) -> int:
+        """Maximum size of a file the bot can send in the current channel."""
+        if self._ctx.guild:
+            return self._ctx.guild.filesize_limit
+        return DEFAULT_UPLOAD_LIMIT_MB * 1024 * 1024
+
+    def _get_cache_params(self) -> dict[str, str]:
+        """
+        Parameters which change the output for the same input bytes. Settings
+        are included as well, as the disk tier outlives configuration changes.
+        """
+        params = {
+            "model": self._get_model_name(animated=False),
+            "animated_model": self._get_model_name(animated=True),
+            "format": self._options.output_format,
+            "max_bytes": self._get_upload_limit(),
+            "engine": REMOVAL_ENGINE,
+            "max_frames": MAX_FRAMES,
+            "max_px_image": MAX_PX_IMAGE,
+            "max_px_animated": MAX_PX_ANIMATED,
+            "downscale_oversized": DOWNSCALE_OVERSIZED,
+            "dedupe_downsample": DEDUPE_DOWNSAMPLE,
+            "gif_encoder": GIF_ENCODER,
+            "gif_alpha_threshold": GIF_ALPHA_THRESHOLD,
+            "webp_quality": WEBP_QUALITY,
+            "webp_method": WEBP_METHOD,
+            "still_mode": STILL_ENCODE_MODE,
+            "still_crop": STILL_CROP,
+            "still_crop_padding": STILL_CROP_PADDING,
+        }
+        return {name: str(value) for name, value in params.items()}
+
+    def _get_model_name(self, animated: bool) -> str:
+        """Model of the requested tier, animations default to the faster tier."""
+        if self._options.model_tier:
+            return MODEL_TIERS[self._options.model_tier]
+        if animated:
+            return MODEL_TIERS[ANIMATED_MODEL_TIER]
+        return REMBG_MODEL
 
-    async def _get_file_io(self) -> BytesIO:
-        file_bytes = self._file.fp.read()
-        file_io = BytesIO(file_bytes)
-        return file_io
+    @staticmethod
+    def _log_cache_lookup(cache: ResultCache, hit: bool):
+        metrics = MetricsLogger("result_cache")
+        metrics.add("hit", str(hit))
+        for name, value in cache.get_stats().items():
+            metrics.add(name, value)
+        metrics.log()
 
     def _retrieve_data(
-        self, bytes_io: BytesIO, mime_type: str
-    ) -> Union[AbstractData, None]:
+        self, bytes_io: MemoryViewIO, mime_type: str
+    ) -> Union[ImageData, StreamData, None]:
         image_mime_types = self._mime_config.image_mime_types
         video_mime_types = self._mime_config.video_mime_types
 
@@ -84,12 +180,14 @@ class MediaHandlerBase:
         return nextcord_file
 
     @staticmethod
-    def _get_image_data(bytes_io: BytesIO, mime_type: str) -> AbstractData:
+    def _get_image_data(
+        bytes_io: MemoryViewIO, mime_type: str
+    ) -> Union[ImageData, StreamData]:
         data = MediaData(bytes_io, mime_type).get_image_data()
         return data
 
     @staticmethod
-    def _get_video_data(bytes_io: BytesIO, mime_type: str) -> AbstractData:
+    def _get_video_data(bytes_io: MemoryViewIO, mime_type: str) -> StreamData:
         data = MediaData(bytes_io, mime_type).get_video_data()
         return data
 
@@ -98,36 +196,68 @@ class MediaHandlerBase:
         uuid_name = uuid4().hex[:10]
         return uuid_name
 
+    async def _process(
+        self,
+        embed_iterator: EmbedImageIterator,
+        file_buffer: memoryview,
+        mime_type: str,
+    ) -> Union[CachedResult, None]:
+        bytes_io = MemoryViewIO(file_buffer)
+
+        data = await asyncio.to_thread(self._retrieve_data, bytes_io, mime_type)
+
+        if not data:
+            return
+
+        budget = OutputBudget(self._get_upload_limit())
+        if isinstance(data, StreamData):
+            encoder = create_encoder(self._options.output_format)
+            encoder.set_budget(budget)
+            model_name = self._get_model_name(animated=True)
+            pipeline = MediaPipeline(embed_iterator, data, encoder, model_name)
+            out_io = await pipeline.run()
+            return CachedResult(data=out_io.getvalue(), ext=encoder.get_extension())
+
+        model_name = self._get_model_name(animated=False)
+        data_out = await BGProcess(embed_iterator, data, model_name).process()
+        encoder = StillEncoder()
+        encoder.set_budget(budget)
+        encoder.append(data_out.frames[0])
+        out_io = await asyncio.to_thread(encoder.finalize)
+        return CachedResult(data=out_io.getvalue(), ext=encoder.get_extension())
+
 
 class MediaHandler(MediaHandlerBase):
     """MediaHandler class which handles different types of media files for rembg."""
 
     async def handler(self) -> Union[nextcord.File, None]:
         """Handle the type of media and removes the background."""
-        mime_type = await self._validate_mime_type()
-        bytes_io = await self._get_file_io()
-
-        data = await asyncio.to_thread(self._retrieve_data, bytes_io, mime_type)
-
-        if not data:
-            return
-        data_out = await BGProcess(self._ctx, data).process()
-
-        if isinstance(data_out, ImageData):
-            out_io = BytesIO()
-            image_frame = data_out.frames[0]
-            image_frame.image.save(out_io, "PNG")
-            out_io.seek(0)
-            nextcord_file = self._create_file(out_io, "png")
-            return nextcord_file
-
-        out_io = ComposeGIF(data_out).reconstruct()
-        nextcord_file = self._create_file(out_io, "gif")
+        file_buffer, mime_type = await self._get_file_buffer()
+
+        cache = ResultCache()
+        cache_params = self._get_cache_params()
+        cache_key = await asyncio.to_thread(cache.create_key, file_buffer, cache_params)
+        result = await asyncio.to_thread(cache.get, cache_key)
+        self._log_cache_lookup(cache, result is not None)
+
+        if not result:
+            embed_iterator = EmbedImageIterator(self._ctx)
+            try:
+                async with JobScheduler().acquire(self._ctx, embed_iterator.queued):
+                    result = await self._process(embed_iterator, file_buffer, mime_type)
+            finally:
+                await embed_iterator.clean()
+
+            if not result:
+                return
+            await asyncio.to_thread(cache.put, cache_key, result)
+
+        nextcord_file = self._create_file(BytesIO(result.data), result.ext)
         return nextcord_file
 
 
 class MediaData:
-    def __init__(self, bytes_io: BytesIO, mime_type: str):
+    def __init__(self, bytes_io: MemoryViewIO, mime_type: str):
         self.bytes_io = bytes_io
         self.mime_type = mime_type
 
@@ -158,15 +288,37 @@ class MediaData:
         return image_pil
 
     @staticmethod
-    def decompose_animated(image_pil: Image.Image) -> AbstractData:
+    def guard_frames(
+        frames: Iterator[AbstractFrame], exception: Type[BaseBotException]
+    ) -> Iterator[AbstractFrame]:
+        """Logs errors raised while decoding frames and replaces them."""
+        try:
+            yield from frames
+        except Exception as error:
+            ExceptionLogger(error).log()
+            raise exception()
+
+    def decompose_animated(
+        self, image_pil: Image.Image, output_size: Union[tuple[int, int], None]
+    ) -> StreamData:
         try:
-            animated_data = AnimatedDecompose(image_pil).create_animated_data()
-            frame_disposal = DisposeDuplicateFrames(animated_data)
-            animated_data = frame_disposal.dispose_frames()
+            animated_decompose = AnimatedDecompose(image_pil)
         except Exception as error:
             ExceptionLogger(error).log()
             raise ImageDecompositionError()
-        return animated_data
+
+        if output_size:
+            animated_decompose.set_output_size(*output_size)
+
+        width, height = animated_decompose.get_resolution()
+        frames = animated_decompose.iter_frames()
+        stream_data = StreamData(
+            frames=self.guard_frames(frames, ImageDecompositionError),
+            framecount=animated_decompose.get_framecount(),
+            width=width,
+            height=height,
+        )
+        return stream_data
 
     @staticmethod
     def create_image_data(image_pil: ImageType, width: int, height: int) -> ImageData:
@@ -183,7 +335,42 @@ class MediaData:
         )
         return image_data
 
-    def get_image_data(self) -> AbstractData:
+    @staticmethod
+    def get_downscaled_size(width: int, height: int, max_px: int) -> tuple[int, int]:
+        """Scales the resolution down so that neither side exceeds max_px."""
+        scale = max_px / max(width, height)
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+    def check_resolution(
+        self, fp_format: str, width: int, height: int, max_px: int
+    ) -> Union[tuple[int, int], None]:
+        """
+        Validates the resolution. With DOWNSCALE_OVERSIZED enabled, returns the
+        size oversized media is decoded at instead of raising.
+        """
+        min_px = 32
+
+        if width > max_px or height > max_px:
+            if not DOWNSCALE_OVERSIZED:
+                raise ExceedsMaxResolution(fp_format, width, height, max_px)
+
+            output_size = self.get_downscaled_size(width, height, max_px)
+            if min(output_size) < min_px:
+                raise ExceedsMaxResolution(fp_format, width, height, max_px)
+            return output_size
+
+        if width < min_px or height < min_px:
+            raise SubceedsMinResolution(fp_format, width, height, min_px)
+
+    @staticmethod
+    def downscale_image(image_pil: Image.Image, size: tuple[int, int]) -> ImageType:
+        # JPEG is reduced by a power of two while decoding, before the resize
+        image_pil.draft("RGB", size)
+        if image_pil.mode not in ("RGB", "RGBA"):
+            image_pil = image_pil.convert("RGBA")
+        return image_pil.resize(size, Image.LANCZOS)
+
+    def get_image_data(self) -> Union[ImageData, StreamData]:
         image_pil = self.open_image()
 
         width, height = image_pil.size
@@ -192,54 +379,77 @@ class MediaData:
         max_frames = MAX_FRAMES
         num_frames = self.get_num_frames(image_pil)
 
-        min_px = 32
         max_px = self.get_max_pixels(num_frames)
 
         # Divided by 2 due to automatic frame disposal
         if (num_frames / 2) > max_frames:
             raise ExceedsMaxFrames(image_format, num_frames, max_frames)
 
-        if width > max_px or height > max_px:
-            raise ExceedsMaxResolution(image_format, width, height, max_px)
-
-        if width < min_px or height < min_px:
-            raise SubceedsMinResolution(image_format, width, height, min_px)
+        output_size = self.check_resolution(image_format, width, height, max_px)
 
         if num_frames == 1:
+            if output_size:
+                image_pil = self.downscale_image(image_pil, output_size)
+                width, height = output_size
             image_data = self.create_image_data(image_pil, width, height)
             return image_data
 
-        return self.decompose_animated(image_pil)
+        return self.decompose_animated(image_pil, output_size)
 
     @staticmethod
-    def decompose_video(video_io: BytesIO) -> AbstractData:
+    def open_video(video_io: MemoryViewIO) -> VideoDecompose:
         try:
-            video_data = VideoDecompose(video_io).create_video_data()
-            frame_disposal = DisposeDuplicateFrames(video_data)
-            video_data = frame_disposal.dispose_frames()
+            video_decompose = VideoDecompose(video_io)
         except Exception as error:
             ExceptionLogger(error).log()
             raise VideoDecompositionError()
-        return video_data
-
-    def get_video_data(self) -> AbstractData:
-        video_data = self.decompose_video(self.bytes_io)
-
-        width, height = video_data.width, video_data.height
-
-        max_frames = MAX_FRAMES
-        num_frames = video_data.framecount
-
-        min_px = 32
-        max_px = self.get_max_pixels(num_frames)
-
-        if num_frames > max_frames:
-            raise ExceedsMaxFrames(self.mime_type, num_frames, max_frames)
-
-        if width > max_px or height > max_px:
-            raise ExceedsMaxResolution(self.mime_type, width, height, max_px)
-
-        if width < min_px or height < min_px:
-            raise SubceedsMinResolution(self.mime_type, width, height, min_px)
+        return video_decompose
+
+    def decompose_video(self, video_decompose: VideoDecompose) -> StreamData:
+        width, height = video_decompose.get_resolution()
+        frames = video_decompose.iter_frames()
+        stream_data = StreamData(
+            frames=self.guard_frames(frames, VideoDecompositionError),
+            framecount=video_decompose.get_framecount(),
+            width=width,
+            height=height,
+        )
+        return stream_data
 
-        return video_data
+    @staticmethod
+    def log_video_probe(video_probe: VideoProbe):
+        metrics = MetricsLogger("video_probe")
+        metrics.add("codec", video_probe.codec)
+        metrics.add("resolution", f"{video_probe.width}x{video_probe.height}")
+        metrics.add("frames", video_probe.framecount)
+        metrics.add("duration", float(video_probe.duration))
+        metrics.log()
+
+    def validate_video_probe(
+        self, video_probe: VideoProbe
+    ) -> Union[tuple[int, int], None]:
+        """
+        Enforces the video limits on the header values, before any decoding.
+        Returns the downscaled size of oversized videos when enabled.
+        """
+        width, height = video_probe.width, video_probe.height
+        duration = video_probe.duration
+
+        max_duration = MAX_VIDEO_DURATION
+        max_px = self.get_max_pixels(video_probe.framecount)
+
+        if duration > max_duration:
+            raise ExceedsMaxDuration(self.mime_type, float(duration), max_duration)
+
+        return self.check_resolution(self.mime_type, width, height, max_px)
+
+    def get_video_data(self) -> StreamData:
+        video_decompose = self.open_video(self.bytes_io)
+
+        video_probe = video_decompose.probe()
+        self.log_video_probe(video_probe)
+        output_size = self.validate_video_probe(video_probe)
+        if output_size:
+            video_decompose.set_output_size(*output_size)
+
+        return self.decompose_video(video_decompose)
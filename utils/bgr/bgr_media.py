@@ -1,30 +1,35 @@
 import ctypes
 import math
+import bisect
 import numpy as np
 
 import av
 from av.container import InputContainer
 from av.video import VideoStream
 
-from wand.image import Image as ImageWand
+from wand.image import Image as ImageWand, STORAGE_TYPES
 from wand.sequence import Sequence
 from wand.api import library as LibraryWand
 
 from io import BytesIO
-from PIL import Image, ImageSequence
+from PIL import Image
 from PIL.Image import Image as ImageType
 
-from typing import Union
+from typing import Union, Iterator
 from fractions import Fraction
 
-from configuration.command_variables.bgr_variables import MAX_FRAMES
+from configuration.command_variables.bgr_variables import (
+    MAX_FRAMES,
+    DEDUPE_CHUNK_SIZE,
+    DEDUPE_DOWNSAMPLE,
+)
+from utils.bgr.bgr_frames import FrameStore, StoredFrame
 from utils.bgr.bgr_dataclasses import (
     VideoData,
-    VideoFrame,
+    VideoProbe,
     AbstractData,
     AbstractFrame,
     AnimatedData,
-    AnimatedFrame,
 )
 
 
@@ -33,11 +38,12 @@ class VideoDecomposeBase:
         self._video_io = video_io
         self._video_input = self._get_container()
         self._video_stream = self._get_stream(self._video_input)
-        self._frames: list[VideoFrame] = []
+        self._frames: list[StoredFrame] = []
         self._framecount = 0
         self._max_framecount = MAX_FRAMES
         self._framecount_ratio = self._get_frame_ratio()
         self._total_duration: Fraction = Fraction(0)
+        self._output_size: Union[tuple[int, int], None] = None
 
     def _get_container(self) -> InputContainer:
         video_input = av.open(self._video_io, mode="r")
@@ -48,23 +54,58 @@ class VideoDecomposeBase:
         video_stream = video_input.streams.video[0]
         return video_stream
 
-    def _get_frame_ratio(self):
+    def _get_duration(self) -> Fraction:
+        stream_duration = self._video_stream.duration
+        time_base = self._video_stream.time_base
+        if stream_duration and time_base:
+            return Fraction(stream_duration) * Fraction(time_base)
+
+        container_duration = self._video_input.duration
+        if container_duration:
+            return Fraction(container_duration, av.time_base)
+        return Fraction(0)
+
+    def _get_header_framecount(self) -> int:
+        """Frame count from the header, estimated from the duration if absent."""
         framecount = self._video_stream.frames
+        if framecount:
+            return framecount
+
+        average_rate = self._video_stream.average_rate
+        if average_rate:
+            return math.ceil(self._get_duration() * Fraction(average_rate))
+        return 0
+
+    def _get_codec_name(self) -> str:
+        return self._video_stream.codec_context.name
+
+    def _probe(self) -> VideoProbe:
+        width, height = self._get_resolution()
+        video_probe = VideoProbe(
+            width=width,
+            height=height,
+            framecount=self._get_header_framecount(),
+            duration=self._get_duration(),
+            codec=self._get_codec_name(),
+        )
+        return video_probe
+
+    def _get_frame_ratio(self) -> int:
+        framecount = self._get_header_framecount()
         framecount_ratio = math.ceil(framecount / self._max_framecount)
-        return framecount_ratio
+        return max(1, framecount_ratio)
+
+    def _get_expected_framecount(self) -> int:
+        framecount = self._get_header_framecount()
+        if not framecount:
+            return self._max_framecount
+        return math.ceil(framecount / self._framecount_ratio)
 
     def _get_resolution(self) -> tuple[int, int]:
         width = self._video_stream.width
         height = self._video_stream.height
         return width, height
 
-    def _frame_duration(self, packet: av.Packet) -> Fraction:
-        time_base = packet.time_base
-        duration = packet.duration
-        frame_duration = time_base * duration * self._framecount_ratio
-        frame_duration = Fraction(frame_duration)
-        return frame_duration
-
     @staticmethod
     def _pil_to_bytesio(image: Image.Image, fp_format: str) -> BytesIO:
         image_io = BytesIO()
@@ -72,46 +113,143 @@ class VideoDecomposeBase:
         image_io.seek(0)
         return image_io
 
-    def _create_frame(
-        self, frame: av.VideoFrame, frame_duration: Fraction
-    ) -> VideoFrame:
-        width, height = self._get_resolution()
-        frame_image = frame.to_image()
-        frame_image.convert("RGBA")
-        video_frame = VideoFrame(
-            image=frame_image, width=width, height=height, duration=frame_duration
-        )
-        return video_frame
+    def _enable_threading(self):
+        # Lets FFmpeg decode with frame and slice threads
+        self._video_stream.thread_type = "AUTO"
 
-    def _create_frame_data(self) -> tuple[list[VideoFrame], int, Fraction]:
-        ratio_stepper = 0
-        idx_stepper = 0
+    def _index_packets(self) -> tuple[list[int], list[int], int]:
+        """
+        Demuxes the stream without decoding it. Returns the frame timestamps in
+        presentation order, the keyframe timestamps and the end timestamp.
+        """
+        frame_pts: list[int] = []
+        keyframe_pts: list[int] = []
+        end_pts = 0
 
         for packet_v in self._video_input.demux(self._video_stream):
-            if packet_v.dts is None:
+            if packet_v.pts is None:
                 continue
+            frame_pts.append(packet_v.pts)
+            if packet_v.is_keyframe:
+                keyframe_pts.append(packet_v.pts)
+            end_pts = max(end_pts, packet_v.pts + (packet_v.duration or 0))
+
+        frame_pts.sort()
+        keyframe_pts.sort()
+        return frame_pts, keyframe_pts, end_pts
+
+    def _sample_targets(self, frame_pts: list[int]) -> list[int]:
+        framecount_ratio = math.ceil(len(frame_pts) / self._max_framecount)
+        return frame_pts[:: max(1, framecount_ratio)]
+
+    def _target_durations(self, targets: list[int], end_pts: int) -> list[Fraction]:
+        time_base = Fraction(self._video_stream.time_base)
+        next_targets = targets[1:] + [max(end_pts, targets[-1])]
+        durations = []
+        for target, next_target in zip(targets, next_targets):
+            durations.append(time_base * (next_target - target))
+        return durations
 
-            frames_v = packet_v.decode()
+    @staticmethod
+    def _get_keyframe(target: int, keyframe_pts: list[int]) -> int:
+        keyframe_idx = bisect.bisect_right(keyframe_pts, target) - 1
+        return keyframe_pts[max(0, keyframe_idx)]
 
-            if ratio_stepper == 0:
-                frame_duration = self._frame_duration(packet_v)
-                self._total_duration += frame_duration
+    def _seek(self, pts: int) -> Iterator[av.VideoFrame]:
+        """Seeks to a keyframe and returns the frames decoded from there."""
+        self._video_input.seek(pts, stream=self._video_stream)
+        for packet_v in self._video_input.demux(self._video_stream):
+            # The final empty packet flushes the frames buffered by the decoder
+            yield from packet_v.decode()
+
+    def _decode_targets(
+        self, targets: list[int], keyframe_pts: list[int]
+    ) -> Iterator[tuple[int, av.VideoFrame]]:
+        """
+        Yields the index of each target with the first frame presented at or
+        after it. A target is decoded from its keyframe when that keyframe lies
+        ahead of the decoder, so frames between distant targets are skipped.
+        """
+        frames: Iterator[av.VideoFrame] = iter(())
+        decoded_pts: Union[int, None] = None
+
+        for idx, target in enumerate(targets):
+            if decoded_pts is not None and target <= decoded_pts:
+                continue
 
-                for frame_v in frames_v:
-                    video_frame = self._create_frame(frame_v, frame_duration)
-                    self._frames.append(video_frame)
-                    self._framecount += 1
-                    idx_stepper += 1
+            keyframe = self._get_keyframe(target, keyframe_pts or targets)
+            if decoded_pts is None or keyframe > decoded_pts:
+                frames = self._seek(keyframe)
 
-            ratio_stepper += 1
+            for frame_v in frames:
+                if frame_v.pts is None or frame_v.pts < target:
+                    continue
+                decoded_pts = frame_v.pts
+                yield idx, frame_v
+                break
 
-            if ratio_stepper == self._framecount_ratio:
-                ratio_stepper = 0
+    def _get_output_size(self) -> tuple[int, int]:
+        if self._output_size:
+            return self._output_size
+        return self._get_resolution()
 
+    def _create_frame(
+        self, store: FrameStore, frame: av.VideoFrame, frame_duration: Fraction
+    ) -> StoredFrame:
+        # Scaled by swscale during the pixel format conversion when the output
+        # size differs from the decoded size
+        width, height = store.get_resolution()
+        frame_array = frame.to_ndarray(
+            width=width, height=height, format="rgba", interpolation="AREA"
+        )
+        stored_frame = store.add_array(frame_array, frame_duration)
+        return stored_frame
+
+    def _iter_frame_data(self) -> Iterator[StoredFrame]:
+        self._enable_threading()
+        frame_pts, keyframe_pts, end_pts = self._index_packets()
+        if not frame_pts:
+            return
+
+        targets = self._sample_targets(frame_pts)
+        durations = self._target_durations(targets, end_pts)
+        store = FrameStore(len(targets), *self._get_output_size())
+
+        previous_idx = -1
+        for idx, frame_v in self._decode_targets(targets, keyframe_pts):
+            # Targets passed over by a late frame extend its duration
+            frame_duration = sum(durations[previous_idx + 1 : idx + 1], Fraction(0))
+            previous_idx = idx
+            self._total_duration += frame_duration
+            stored_frame = self._create_frame(store, frame_v, frame_duration)
+            self._framecount += 1
+            yield stored_frame
+
+    def _create_frame_data(self) -> tuple[list[StoredFrame], int, Fraction]:
+        self._frames = list(self._iter_frame_data())
         return self._frames, self._framecount, self._total_duration
 
 
 class VideoDecompose(VideoDecomposeBase):
+    def probe(self) -> VideoProbe:
+        """Reads the video properties without decoding any frame."""
+        return self._probe()
+
+    def get_resolution(self) -> tuple[int, int]:
+        """Resolution of the yielded frames."""
+        return self._get_output_size()
+
+    def set_output_size(self, width: int, height: int):
+        """Scales the frames to the given size while they are decoded."""
+        self._output_size = (width, height)
+
+    def get_framecount(self) -> int:
+        """Upper bound of the number of frames yielded by iter_frames."""
+        return self._get_expected_framecount()
+
+    def iter_frames(self) -> Iterator[StoredFrame]:
+        return self._iter_frame_data()
+
     def create_video_data(self) -> VideoData:
         width, height = self._get_resolution()
         frames, framecount, total_duration = self._create_frame_data()
@@ -132,21 +270,25 @@ class VideoDecompose(VideoDecomposeBase):
 class AnimatedDecomposeBase:
     def __init__(self, image: Image.Image):
         self._image = image
-        self._sequence_frames = self._get_sequence_frames()
-        self._frames: list[AnimatedFrame] = []
+        self._sequence_framecount = self._get_sequence_framecount()
+        self._frames: list[StoredFrame] = []
         self._framecount = 0
         self._max_framecount = MAX_FRAMES
         self._framecount_ratio = self._get_frame_ratio()
         self._total_duration: Fraction = Fraction(0)
+        self._output_size: Union[tuple[int, int], None] = None
 
-    def _get_sequence_frames(self):
-        sequence_frames = ImageSequence.all_frames(self._image)
-        return sequence_frames
+    def _get_sequence_framecount(self) -> int:
+        return getattr(self._image, "n_frames", 1)
 
     def _get_frame_ratio(self) -> int:
-        framecount = len(self._sequence_frames)
+        framecount = self._sequence_framecount
         framecount_ratio = math.ceil(framecount / self._max_framecount)
-        return framecount_ratio
+        return max(1, framecount_ratio)
+
+    def _get_expected_framecount(self) -> int:
+        framecount = self._sequence_framecount
+        return math.ceil(framecount / self._framecount_ratio)
 
     @staticmethod
     def _get_resolution(frame: Image.Image) -> tuple[int, int]:
@@ -161,12 +303,10 @@ class AnimatedDecomposeBase:
         return duration
 
     def _frame_duration(self, frame: Image.Image) -> Fraction:
-        duration = frame.info["duration"]
+        duration = frame.info.get("duration")
         duration = self._correct_duration(duration)
         duration_s = Fraction(duration, 1000)
-        frame_duration = duration_s * self._framecount_ratio
-        frame_duration = Fraction(frame_duration)
-        return frame_duration
+        return duration_s
 
     @staticmethod
     def _pil_to_bytesio(image: Image.Image, fp_format: str) -> BytesIO:
@@ -175,44 +315,69 @@ class AnimatedDecomposeBase:
         image_io.seek(0)
         return image_io
 
+    def _get_output_size(self) -> tuple[int, int]:
+        if self._output_size:
+            return self._output_size
+        return self._get_resolution(self._image)
+
     def _create_frame(
-        self, frame: Image.Image, frame_duration: Fraction
-    ) -> AnimatedFrame:
-        width, height = self._get_resolution(frame)
+        self, store: FrameStore, frame: Image.Image, frame_duration: Fraction
+    ) -> StoredFrame:
         frame = frame.convert("RGBA")
+        if self._output_size:
+            frame = frame.resize(self._output_size, Image.LANCZOS)
+        stored_frame = store.add_image(frame, frame_duration)
+        return stored_frame
+
+    def _iter_frame_data(self) -> Iterator[StoredFrame]:
+        """
+        Seeks through the frames in order so Pillow keeps applying the GIF
+        disposal of every frame, but only copies the frames which are kept.
+        Skipped frames add their duration to the kept frame before them.
+        """
+        store = FrameStore(self._get_expected_framecount(), *self._get_output_size())
+        stored_frame: Union[StoredFrame, None] = None
+
+        for idx in range(self._sequence_framecount):
+            self._image.seek(idx)
+            frame_duration = self._frame_duration(self._image)
+            self._total_duration += frame_duration
+
+            if idx % self._framecount_ratio:
+                if stored_frame:
+                    stored_frame.duration += frame_duration
+                continue
 
-        animated_frame = AnimatedFrame(
-            image=frame,
-            width=width,
-            height=height,
-            duration=frame_duration,
-        )
-        return animated_frame
+            if stored_frame:
+                yield stored_frame
 
-    def _create_frame_data(self) -> tuple[list[AnimatedFrame], int, Fraction]:
-        ratio_stepper = 0
-        idx_stepper = 0
+            stored_frame = self._create_frame(store, self._image, frame_duration)
+            self._framecount += 1
 
-        for frame in self._sequence_frames:
-            if ratio_stepper == 0:
+        if stored_frame:
+            yield stored_frame
 
-                frame_duration = self._frame_duration(frame)
-                self._total_duration += frame_duration
+    def _create_frame_data(self) -> tuple[list[StoredFrame], int, Fraction]:
+        self._frames = list(self._iter_frame_data())
+        return self._frames, self._framecount, self._total_duration
 
-                animated_frame = self._create_frame(frame, frame_duration)
-                self._frames.append(animated_frame)
-                self._framecount += 1
-                idx_stepper += 1
 
-            ratio_stepper += 1
+class AnimatedDecompose(AnimatedDecomposeBase):
+    def get_resolution(self) -> tuple[int, int]:
+        """Resolution of the yielded frames."""
+        return self._get_output_size()
 
-            if ratio_stepper == self._framecount_ratio:
-                ratio_stepper = 0
+    def set_output_size(self, width: int, height: int):
+        """Resizes the kept frames to the given size once each."""
+        self._output_size = (width, height)
 
-        return self._frames, self._framecount, self._total_duration
+    def get_framecount(self) -> int:
+        """Upper bound of the number of frames yielded by iter_frames."""
+        return self._get_expected_framecount()
 
+    def iter_frames(self) -> Iterator[StoredFrame]:
+        return self._iter_frame_data()
 
-class AnimatedDecompose(AnimatedDecomposeBase):
     def create_animated_data(self) -> AnimatedData:
         frames, framecount, total_duration = self._create_frame_data()
 
@@ -230,57 +395,62 @@ class AnimatedDecompose(AnimatedDecomposeBase):
 
 
 class ComposeGIFBase:
-    def __init__(self, data: AbstractData):
+    def __init__(self, data: Union[AbstractData, None] = None):
         self._data = data
         self._bg_dispose = ctypes.c_int(2)
+        self._char_storage = STORAGE_TYPES.index("char")
         self._animated_io: BytesIO = BytesIO()
-        self._frames = self._retrieve_frames()
+        self._wand = ImageWand()
 
     def _retrieve_frames(self) -> list[AbstractFrame]:
+        if not self._data:
+            return []
         return self._data.frames
 
-    @staticmethod
-    def _retrieve_frame_and_duration(
-        frame: AbstractFrame,
-    ) -> tuple[ImageType, Fraction]:
-        image = frame.image
-        duration = frame.duration
-        return image, duration
-
     @staticmethod
     def _retrieve_resolution(frame: AbstractFrame) -> tuple[int, int]:
         return frame.width, frame.height
 
     @staticmethod
-    def _pil_to_bytesio(image: Image.Image, fp_format: str) -> BytesIO:
-        image_io = BytesIO()
-        image.save(image_io, format=fp_format)
-        image_io.seek(0)
-        return image_io
+    def _frame_array(frame: AbstractFrame) -> np.ndarray:
+        if isinstance(frame, StoredFrame):
+            return frame.array
+        image = frame.image
+        if image.mode != "RGBA":
+            image = image.convert("RGBA")
+        return np.asarray(image)
+
+    def _import_pixels(self, wand_image: ImageWand, array: np.ndarray):
+        """Copies (H, W, 4) uint8 pixels into the image straight from memory."""
+        array = np.ascontiguousarray(array, dtype=np.uint8)
+        height, width = array.shape[:2]
+        success = LibraryWand.MagickImportImagePixels(
+            wand_image.wand,
+            0,
+            0,
+            width,
+            height,
+            b"RGBA",
+            self._char_storage,
+            array.ctypes.data_as(ctypes.c_void_p),
+        )
+        if not success:
+            wand_image.raise_exception()
 
+    def _append_frame(self, frame: AbstractFrame):
+        WandSequence: Sequence = self._wand.sequence
+        duration = frame.duration
+        width, height = self._retrieve_resolution(frame)
+        array = self._frame_array(frame)
 
-class ComposeGIF(ComposeGIFBase):
-    def reconstruct(self) -> BytesIO:
-        with ImageWand() as wand:
-            WandSequence: Sequence = wand.sequence
-            for frame in self._frames:
-                image, duration = self._retrieve_frame_and_duration(frame)
-                width, height = self._retrieve_resolution(frame)
-                image = self._pil_to_bytesio(image, "PNG")
-
-                with (
-                    ImageWand(blob=image) as wand_image,
-                    ImageWand(
-                        width=width, height=height, background=None
-                    ) as bg_composite,
-                ):
-                    bg_composite.composite(wand_image, 0, 0)
-                    LibraryWand.MagickSetImageDispose(
-                        bg_composite.wand, self._bg_dispose
-                    )
-                    bg_composite.delay = int(duration * 100)
-                    WandSequence.append(bg_composite)
+        with ImageWand(width=width, height=height, background=None) as wand_image:
+            self._import_pixels(wand_image, array)
+            LibraryWand.MagickSetImageDispose(wand_image.wand, self._bg_dispose)
+            wand_image.delay = int(duration * 100)
+            WandSequence.append(wand_image)
 
+    def _save(self) -> BytesIO:
+        with self._wand as wand:
             wand.type = "optimize"
             wand.format = "GIF"
             wand.save(file=self._animated_io)
@@ -289,13 +459,31 @@ class ComposeGIF(ComposeGIFBase):
         return self._animated_io
 
 
-class DisposeDuplicateBase:
-    def __init__(self, data: AbstractData):
-        self._data = data
-        self._frames = self._retrieve_frames()
+class ComposeGIF(ComposeGIFBase):
+    def append(self, frame: AbstractFrame):
+        """Adds a frame to the end of the GIF sequence."""
+        self._append_frame(frame)
 
-    def _retrieve_frames(self) -> list[AbstractFrame]:
-        return self._data.frames
+    def finalize(self) -> BytesIO:
+        """Encodes the appended frames into a GIF."""
+        return self._save()
+
+    def reconstruct(self) -> BytesIO:
+        for frame in self._retrieve_frames():
+            self._append_frame(frame)
+        return self._save()
+
+
+class DisposeDuplicateBase:
+    def __init__(self, mse_strength: float, downsample: int):
+        self._mse_strength = mse_strength
+        self._downsample = max(1, downsample)
+        self._chunk_size = max(1, DEDUPE_CHUNK_SIZE)
+        self._head_frame: Union[AbstractFrame, None] = None
+        self._head_array: Union[np.ndarray, None] = None
+        self._last_array: Union[np.ndarray, None] = None
+        self._last_is_head = False
+        self._buffers: dict[tuple[int, ...], tuple[np.ndarray, ...]] = {}
 
     @staticmethod
     def _retrieve_frame_and_duration(
@@ -310,76 +498,183 @@ class DisposeDuplicateBase:
         frame.duration = duration
         return frame
 
-    def _remove_frame(self, idx: int):
-        self._data.frames.pop(idx)
-        self._data.framecount -= 1
-
     @staticmethod
     def _retrieve_resolution(frame: AbstractFrame) -> tuple[int, int]:
         return frame.width, frame.height
 
-    @staticmethod
-    def mse(a: ImageType, b: ImageType):
-        nd_a = np.asarray(a, dtype="float")
-        nd_b = np.asarray(b, dtype="float")
-
-        nd_a = np.divide(nd_a, 100)
-        nd_b = np.divide(nd_b, 100)
-
-        image_diff = np.subtract(nd_a, nd_b)
-        image_diff = image_diff**2
-        image_sum = np.sum(image_diff)
-
-        mse_error = np.divide(image_sum, (nd_a.shape[0] * nd_b.shape[1]))
-        return mse_error
-
-    def _dispose_duplicates(self, duplicate_idx: list[int]):
-        shift = 0
-        for idx in duplicate_idx:
-            idx -= shift
-            self._remove_frame(idx)
-            shift += 1
-
-    def _dispose(self, mse_strength):
-        previous_frame = None
-        duplicate_idx = []
-        duplicate_duration = Fraction(0)
-
-        for idx, frame in enumerate(self._frames):
-            image, duration = self._retrieve_frame_and_duration(frame)
-            width, height = self._retrieve_resolution(frame)
-
-            if not previous_frame:
-                previous_frame = frame
-                duplicate_duration += duration
-                continue
-
-            prev_image, _ = self._retrieve_frame_and_duration(previous_frame)
-            prev_width, prev_height = self._retrieve_resolution(previous_frame)
-
-            if width == prev_width and height == prev_height:
-                mse_error = self.mse(image, prev_image)
-
-                if mse_error < mse_strength:
-                    duplicate_duration += duration
-                    duplicate_idx.append(idx)
-                    self._insert_new_duration(previous_frame, duplicate_duration)
-                    continue
-
-            self._dispose_duplicates(duplicate_idx)
-
-            previous_frame = None
-            duplicate_idx = []
-            duplicate_duration = Fraction(0)
-            duplicate_duration += duration
+    def _frame_array(self, frame: AbstractFrame) -> np.ndarray:
+        if isinstance(frame, StoredFrame):
+            array = frame.array
+        else:
+            image, _ = self._retrieve_frame_and_duration(frame)
+            array = np.asarray(image)
+        if array.ndim == 2:
+            array = array[:, :, np.newaxis]
+        if self._downsample > 1:
+            array = array[:: self._downsample, :: self._downsample]
+        return array
+
+    def _get_threshold(self, shape: tuple[int, ...]) -> float:
+        """
+        Squared error sum below which two frames are duplicates, equal to the
+        mean squared error over pixels with the channel values scaled by 1/100.
+        """
+        height, width = shape[:2]
+        return self._mse_strength * 10000 * height * width
+
+    def _get_buffers(
+        self, shape: tuple[int, ...], count: int
+    ) -> tuple[np.ndarray, ...]:
+        """Reuses the uint8 stack and difference buffers of a frame shape."""
+        buffers = self._buffers.get(shape)
+        if buffers is None or len(buffers[0]) < count:
+            size = max(count, self._chunk_size + 1)
+            buffers = tuple(np.empty((size,) + shape, dtype=np.uint8) for _ in range(3))
+            self._buffers = {shape: buffers}
+        return buffers
+
+    def _squared_error_sums(self, arrays: list[np.ndarray]) -> np.ndarray:
+        """Squared error sums between consecutive arrays of the same shape."""
+        count = len(arrays)
+        stack, diff, scratch = self._get_buffers(arrays[0].shape, count)
+        for idx, array in enumerate(arrays):
+            stack[idx] = array
+
+        current = stack[1:count]
+        previous = stack[: count - 1]
+        abs_diff = diff[: count - 1]
+        # Absolute difference without leaving uint8, the smaller value is
+        # subtracted from the larger one so the result never wraps
+        np.maximum(current, previous, out=abs_diff)
+        np.minimum(current, previous, out=scratch[: count - 1])
+        np.subtract(abs_diff, scratch[: count - 1], out=abs_diff)
+
+        flat_diff = abs_diff.reshape(count - 1, -1)
+        return np.einsum("ij,ij->i", flat_diff, flat_diff, dtype=np.int64)
+
+    def _consecutive_errors(self, arrays: list[np.ndarray]) -> list[Union[int, None]]:
+        """
+        Squared error sums of each array to its predecessor, computed per run
+        of equally shaped arrays. None where the shapes differ.
+        """
+        errors: list[Union[int, None]] = [None] * len(arrays)
+        predecessors = [self._last_array] + arrays[:-1]
+
+        start = 0
+        while start < len(arrays):
+            shape = arrays[start].shape
+            end = start
+            while end < len(arrays) and arrays[end].shape == shape:
+                end += 1
+
+            predecessor = predecessors[start]
+            if predecessor is not None and predecessor.shape == shape:
+                group = [predecessor] + arrays[start:end]
+                offset = start
+            else:
+                group = arrays[start:end]
+                offset = start + 1
+
+            if len(group) > 1:
+                sums = self._squared_error_sums(group)
+                errors[offset:end] = [int(error) for error in sums]
+            start = end
+        return errors
+
+    def _is_duplicate(
+        self, frame: AbstractFrame, array: np.ndarray, error: Union[int, None]
+    ) -> bool:
+        head_frame = self._head_frame
+        head_array = self._head_array
+        if head_frame is None or head_array is None:
+            return False
+
+        if self._retrieve_resolution(frame) != self._retrieve_resolution(head_frame):
+            return False
+
+        if head_array.shape != array.shape:
+            return False
+
+        # Frames are compared against the first frame of their run, the
+        # consecutive error only applies while the predecessor is that frame
+        if not self._last_is_head or error is None:
+            error = int(self._squared_error_sums([head_array, array])[0])
+        return error < self._get_threshold(array.shape)
+
+    def _merge_duration(self, frame: AbstractFrame):
+        head_frame = self._head_frame
+        if head_frame is None:
+            return
+        _, duration = self._retrieve_frame_and_duration(frame)
+        _, head_duration = self._retrieve_frame_and_duration(head_frame)
+        self._insert_new_duration(head_frame, head_duration + duration)
+
+    def _push(self, frames: list[AbstractFrame]) -> list[AbstractFrame]:
+        arrays = [self._frame_array(frame) for frame in frames]
+        errors = self._consecutive_errors(arrays)
+
+        kept_frames = []
+        for frame, array, error in zip(frames, arrays, errors):
+            if self._is_duplicate(frame, array, error):
+                self._merge_duration(frame)
+                self._last_is_head = False
+            else:
+                if self._head_frame is not None:
+                    kept_frames.append(self._head_frame)
+                self._head_frame = frame
+                self._head_array = array
+                self._last_is_head = True
+            self._last_array = array
+        return kept_frames
+
+    def _flush(self) -> Union[AbstractFrame, None]:
+        head_frame = self._head_frame
+        self._head_frame = None
+        self._head_array = None
+        self._last_array = None
+        self._last_is_head = False
+        return head_frame
+
+
+class DisposeDuplicateStream(DisposeDuplicateBase):
+    """
+    Merges consecutive duplicate frames of a stream into the first frame of
+    their run, which is released once a differing frame arrives.
+    """
+
+    def __init__(self, mse_strength: float = 0.03, downsample: int = DEDUPE_DOWNSAMPLE):
+        super().__init__(mse_strength, downsample)
+
+    def get_chunk_size(self) -> int:
+        return self._chunk_size
+
+    def push(self, frames: list[AbstractFrame]) -> list[AbstractFrame]:
+        """Pushes a chunk of frames and returns the frames whose run ended."""
+        return self._push(frames)
+
+    def flush(self) -> Union[AbstractFrame, None]:
+        return self._flush()
+
+
+class DisposeDuplicateFrames:
+    def __init__(self, data: AbstractData):
+        self._data = data
 
-        self._dispose_duplicates(duplicate_idx)
+    def dispose_frames(
+        self, mse_strength: float = 0.03, downsample: int = DEDUPE_DOWNSAMPLE
+    ) -> AbstractData:
+        frame_disposal = DisposeDuplicateStream(mse_strength, downsample)
+        chunk_size = frame_disposal.get_chunk_size()
 
+        frames = []
+        for idx in range(0, len(self._data.frames), chunk_size):
+            chunk = self._data.frames[idx : idx + chunk_size]
+            frames.extend(frame_disposal.push(chunk))
 
-class DisposeDuplicateFrames(DisposeDuplicateBase):
-    def __init__(self, data: AbstractData):
-        super().__init__(data)
+        last_frame = frame_disposal.flush()
+        if last_frame:
+            frames.append(last_frame)
 
-    def dispose_frames(self, mse_strength: float = 0.03) -> AbstractData:
-        self._dispose(mse_strength)
+        self._data.frames = frames
+        self._data.framecount = len(frames)
         return self._data
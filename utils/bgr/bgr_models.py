@@ -0,0 +1,169 @@
+import os
+import onnx
+import logging
+import threading
+
+from onnxruntime.quantization import quantize_dynamic, QuantType
+from rembg.session_factory import new_session
+
+from exceptions.model_exceptions import UnavailableModel
+from configuration.command_variables.bgr_variables import (
+    REMBG_MODEL,
+    MODEL_TIERS,
+    ANIMATED_MODEL_TIER,
+)
+
+logger = logging.getLogger("nextcord")
+
+QUANTIZED_SUFFIX = "_quant"
+BATCHED_EXTENSION = ".batched.onnx"
+# Models rembg==2.0.19 can download, other names fail inside new_session
+REMBG_MODELS = ("u2net", "u2netp", "u2net_human_seg", "u2net_cloth_seg")
+# Models with one image input and one mask output, run by rembg's SimpleSession
+BATCHABLE_MODELS = ("u2net", "u2netp", "u2net_human_seg")
+
+
+class ModelStoreBase:
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_models_directory() -> str:
+        u2net_home = os.getenv(
+            "U2NET_HOME", os.path.join(os.getenv("XDG_DATA_HOME", "~"), ".u2net")
+        )
+        return os.path.expanduser(u2net_home)
+
+    def _get_model_path(self, model_name: str) -> str:
+        return os.path.join(self._get_models_directory(), f"{model_name}.onnx")
+
+    @staticmethod
+    def _is_quantized(model_name: str) -> bool:
+        return model_name.endswith(QUANTIZED_SUFFIX)
+
+    def _get_base_name(self, model_name: str) -> str:
+        if self._is_quantized(model_name):
+            return model_name[: -len(QUANTIZED_SUFFIX)]
+        return model_name
+
+    def _is_available(self, model_name: str) -> bool:
+        """Whether the model file exists or can be downloaded or generated."""
+        if os.path.isfile(self._get_model_path(model_name)):
+            return True
+        if self._is_quantized(model_name):
+            return self._is_available(self._get_base_name(model_name))
+        return model_name in REMBG_MODELS
+
+    @staticmethod
+    def _download(model_name: str):
+        # rembg downloads the model file and verifies its checksum
+        new_session(model_name)
+
+    def _quantize(self, model_name: str, model_path: str):
+        """Writes the INT8 weight quantization of the base model next to it."""
+        base_name = self._get_base_name(model_name)
+        base_path = self._ensure_model(base_name)
+        tmp_path = model_path + ".tmp"
+        quantize_dynamic(base_path, tmp_path, weight_type=QuantType.QUInt8)
+        os.replace(tmp_path, model_path)
+        logger.log(logging.INFO, f"Quantized model: {base_name} -> {model_name}")
+
+    def _get_batched_path(self, model_name: str) -> str:
+        return os.path.join(
+            self._get_models_directory(), model_name + BATCHED_EXTENSION
+        )
+
+    def _is_batchable(self, model_name: str) -> bool:
+        return self._get_base_name(model_name) in BATCHABLE_MODELS
+
+    @staticmethod
+    def _set_dynamic_batch(model: onnx.ModelProto):
+        """
+        The published models are exported with a batch size of 1. The first
+        dimension of the inputs and outputs is renamed to a symbolic one, and
+        the inferred intermediate shapes, which repeat the fixed size, are
+        dropped for onnxruntime to infer again.
+        """
+        graph = model.graph
+        for value in [*graph.input, *graph.output]:
+            batch_dim = value.type.tensor_type.shape.dim[0]
+            batch_dim.ClearField("dim_value")
+            batch_dim.dim_param = "batch"
+        del graph.value_info[:]
+
+    def _write_batched(self, model_name: str, batched_path: str):
+        """Writes a copy of the model with a dynamic batch dimension."""
+        model = onnx.load(self._ensure_model(model_name))
+        self._set_dynamic_batch(model)
+        tmp_path = batched_path + ".tmp"
+        onnx.save(model, tmp_path)
+        os.replace(tmp_path, batched_path)
+        logger.log(logging.INFO, f"Enabled batching of model: {model_name}")
+
+    def _ensure_model(self, model_name: str) -> str:
+        model_path = self._get_model_path(model_name)
+        if os.path.isfile(model_path):
+            return model_path
+
+        if not self._is_available(model_name):
+            raise UnavailableModel(model_name)
+        if self._is_quantized(model_name):
+            self._quantize(model_name, model_path)
+        else:
+            self._download(model_name)
+        return model_path
+
+
+class ModelStore(ModelStoreBase):
+    """
+    Locates the model files in the rembg model directory. Missing models are
+    downloaded by rembg, and quantized models ("<model>_quant") are generated
+    once from their base model and reused afterwards.
+    """
+
+    def __init__(self):
+        pass  # For Singleton class to work properly
+
+    def __new__(cls, *args, **kwargs):
+        if not hasattr(cls, "instance") or not isinstance(cls.instance, cls):
+            cls.instance = super(ModelStore, cls).__new__(cls)
+            super(cls, cls.instance).__init__(*args, **kwargs)
+        return cls.instance
+
+    def get_model_path(self, model_name: str) -> str:
+        """Path of the model file, without making it available."""
+        return self._get_model_path(model_name)
+
+    def ensure_model(self, model_name: str) -> str:
+        """Returns the path of the model file, downloading or generating it first."""
+        with self._lock:
+            return self._ensure_model(model_name)
+
+    def ensure_batched_model(self, model_name: str) -> str:
+        """
+        Returns the path of a copy of the model which runs several frames at
+        once, generating it first. The original file is left as rembg
+        verifies its checksum.
+        """
+        with self._lock:
+            batched_path = self._get_batched_path(model_name)
+            if not os.path.isfile(batched_path):
+                self._write_batched(model_name, batched_path)
+            return batched_path
+
+    def is_batchable(self, model_name: str) -> bool:
+        return self._is_batchable(model_name)
+
+    def is_quantized(self, model_name: str) -> bool:
+        return self._is_quantized(model_name)
+
+    def get_default_models(self) -> list[str]:
+        """Models used when no tier is requested, for stills and animations."""
+        animated_model = MODEL_TIERS[ANIMATED_MODEL_TIER]
+        return list(dict.fromkeys([REMBG_MODEL, animated_model]))
+
+    def validate_models(self):
+        """Raises UnavailableModel if a configured model cannot be obtained."""
+        for model_name in [REMBG_MODEL, *MODEL_TIERS.values()]:
+            if not self._is_available(model_name):
+                raise UnavailableModel(model_name)
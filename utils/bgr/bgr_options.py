@@ -0,0 +1,46 @@
+from dataclasses import dataclass
+from typing import Union
+
+from utils.bgr.bgr_encoders import OUTPUT_ENCODERS
+from exceptions.option_exceptions import UnsupportedOption
+from configuration.command_variables.bgr_variables import (
+    OUTPUT_FORMAT,
+    MODEL_TIERS,
+)
+
+
+@dataclass
+class RequestOptions:
+    output_format: str = OUTPUT_FORMAT
+    model_tier: Union[str, None] = None
+
+
+class OptionParserBase:
+    def __init__(self, options: tuple[str, ...]):
+        self._options = [option.lower() for option in options]
+
+    @staticmethod
+    def _get_supported() -> list[str]:
+        return list(OUTPUT_ENCODERS) + list(MODEL_TIERS)
+
+    def _parse(self) -> RequestOptions:
+        request_options = RequestOptions()
+        for option in self._options:
+            if option in OUTPUT_ENCODERS:
+                request_options.output_format = option
+                continue
+            if option in MODEL_TIERS:
+                request_options.model_tier = option
+                continue
+            raise UnsupportedOption(option, self._get_supported())
+        return request_options
+
+
+class OptionParser(OptionParserBase):
+    """Parses the options given after the rembg command."""
+
+    def __init__(self, options: tuple[str, ...]):
+        super().__init__(options)
+
+    def parse(self) -> RequestOptions:
+        return self._parse()
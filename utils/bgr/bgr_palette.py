@@ -0,0 +1,186 @@
+import struct
+import numpy as np
+
+from io import BytesIO
+from PIL import Image, GifImagePlugin
+
+
+class PaletteQuantizerBase:
+    def __init__(self, alpha_threshold: int, colors: int):
+        self._alpha_threshold = alpha_threshold
+        # One index is kept for transparency
+        self._colors = max(2, min(255, colors))
+        self._palette = np.zeros((1, 3), dtype=np.uint8)
+        self._lut = np.zeros(32768, dtype=np.uint8)
+
+    def _sample_pixels(self, array: np.ndarray, max_pixels: int) -> np.ndarray:
+        opaque = array[..., 3] >= self._alpha_threshold
+        pixels = array[..., :3][opaque]
+        step = max(1, len(pixels) // max_pixels)
+        return pixels[::step]
+
+    def _build_palette(self, samples: np.ndarray) -> np.ndarray:
+        """Median cut over the sampled pixels."""
+        if not len(samples):
+            return np.zeros((1, 3), dtype=np.uint8)
+        sample_image = Image.fromarray(samples[np.newaxis])
+        quantized = sample_image.quantize(self._colors, method=Image.MEDIANCUT)
+        used = int(np.asarray(quantized).max()) + 1
+        palette = np.array(quantized.getpalette()[: used * 3], dtype=np.uint8)
+        return palette.reshape(-1, 3)
+
+    def _build_lut(self, palette: np.ndarray) -> np.ndarray:
+        """
+        Maps every colour reduced to 5 bits per channel to its nearest palette
+        index, so quantizing a frame is a single table lookup per pixel.
+        """
+        grid = (np.arange(32, dtype=np.int32) << 3) + 4
+        cells = np.stack(np.meshgrid(grid, grid, grid, indexing="ij"), axis=-1)
+        cells = cells.reshape(-1, 3)
+        palette = palette.astype(np.int32)
+
+        lut = np.empty(len(cells), dtype=np.uint8)
+        for start in range(0, len(cells), 4096):
+            chunk = cells[start : start + 4096]
+            distances = ((chunk[:, np.newaxis] - palette[np.newaxis]) ** 2).sum(-1)
+            lut[start : start + 4096] = distances.argmin(axis=1)
+        return lut
+
+    def _fit(self, arrays: list[np.ndarray]):
+        max_pixels = 131072 // max(1, len(arrays))
+        samples = [self._sample_pixels(array, max_pixels) for array in arrays]
+        self._palette = self._build_palette(np.concatenate(samples))
+        self._lut = self._build_lut(self._palette)
+
+    def _quantize(self, array: np.ndarray) -> np.ndarray:
+        reduced = array[..., :3] >> 3
+        keys = reduced[..., 0].astype(np.uint16) << 10
+        keys |= reduced[..., 1].astype(np.uint16) << 5
+        keys |= reduced[..., 2]
+        indices = self._lut[keys]
+        indices[array[..., 3] < self._alpha_threshold] = self._get_transparent_index()
+        return indices
+
+    def _get_transparent_index(self) -> int:
+        return len(self._palette)
+
+
+class PaletteQuantizer(PaletteQuantizerBase):
+    """
+    Global palette of an animation, built from a sample of its frames.
+    Pixels below the alpha threshold map to the transparent index, which
+    follows the palette colours.
+    """
+
+    def __init__(self, alpha_threshold: int, colors: int = 255):
+        super().__init__(alpha_threshold, colors)
+
+    def fit(self, arrays: list[np.ndarray]):
+        """Builds the palette from (H, W, 4) uint8 sample frames."""
+        self._fit(arrays)
+
+    def quantize(self, array: np.ndarray) -> np.ndarray:
+        """Maps an (H, W, 4) uint8 frame to (H, W) palette indices."""
+        return self._quantize(array)
+
+    def get_palette(self) -> np.ndarray:
+        return self._palette
+
+    def get_transparent_index(self) -> int:
+        return self._get_transparent_index()
+
+
+class GIFWriterBase:
+    def __init__(self, width: int, height: int, palette: np.ndarray):
+        self._width = width
+        self._height = height
+        self._palette = palette
+        self._transparent_index = len(palette)
+        self._gif_io = BytesIO()
+
+    def _get_table_bits(self) -> int:
+        # The colour table holds a power of two of entries, at least 2
+        colors = self._transparent_index + 1
+        return max(1, int(np.ceil(np.log2(colors))))
+
+    def _write_header(self):
+        table_bits = self._get_table_bits()
+        flags = 0x80 | (7 << 4) | (table_bits - 1)
+        self._gif_io.write(b"GIF89a")
+        self._gif_io.write(
+            struct.pack(
+                "<HHBBB", self._width, self._height, flags, self._transparent_index, 0
+            )
+        )
+
+        color_table = np.zeros((1 << table_bits, 3), dtype=np.uint8)
+        color_table[: len(self._palette)] = self._palette
+        self._gif_io.write(color_table.tobytes())
+
+        # Loops forever
+        self._gif_io.write(b"!\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+    def _encode_frame(
+        self,
+        indices: np.ndarray,
+        offset: tuple[int, int],
+        duration_ms: int,
+        disposal: int,
+    ) -> bytes:
+        image = Image.fromarray(indices)
+        chunks = GifImagePlugin.getdata(
+            image,
+            offset,
+            duration=duration_ms,
+            disposal=disposal,
+            transparency=self._transparent_index,
+        )
+        return b"".join(chunks)
+
+    def _write_trailer(self):
+        self._gif_io.write(b";")
+
+
+class GIFWriter(GIFWriterBase):
+    """
+    Writes GIF frames of palette indices against a single global colour
+    table, the LZW coding is done by Pillow.
+    """
+
+    def __init__(self, width: int, height: int, palette: np.ndarray):
+        super().__init__(width, height, palette)
+        self._write_header()
+
+    def add_frame(
+        self,
+        indices: np.ndarray,
+        offset: tuple[int, int],
+        duration_ms: int,
+        disposal: int,
+    ):
+        """
+        Adds an (h, w) uint8 rectangle drawn at offset. Disposal 1 keeps the
+        frame on the canvas, disposal 2 clears its rectangle afterwards.
+        """
+        self._gif_io.write(self._encode_frame(indices, offset, duration_ms, disposal))
+
+    def encode_frame(
+        self,
+        indices: np.ndarray,
+        offset: tuple[int, int],
+        duration_ms: int,
+        disposal: int,
+    ) -> bytes:
+        """
+        Encodes a frame like add_frame without adding it, safe to call from
+        several threads at once.
+        """
+        return self._encode_frame(indices, offset, duration_ms, disposal)
+
+    def add_encoded_frame(self, encoded_frame: bytes):
+        self._gif_io.write(encoded_frame)
+
+    def finalize(self) -> BytesIO:
+        self._write_trailer()
+        self._gif_io.seek(0)
+        return self._gif_io
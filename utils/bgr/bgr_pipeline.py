@@ -0,0 +1,134 @@
+import asyncio
+
+from io import BytesIO
+from typing import Union, Iterator, Callable, Coroutine, Any
+
+from utils.bgr.bgr_utils import BGProcessStream
+from utils.bgr.bgr_embeds import EmbedImageIterator
+from utils.bgr.bgr_dataclasses import AbstractFrame, StreamData
+from utils.bgr.bgr_media import DisposeDuplicateStream
+from utils.bgr.bgr_encoders import OutputEncoder
+from configuration.command_variables.bgr_variables import PIPELINE_QUEUE_DEPTH
+
+
+class MediaPipelineBase:
+    def __init__(
+        self,
+        embed_iterator: EmbedImageIterator,
+        data: StreamData,
+        encoder: OutputEncoder,
+        model_name: str,
+    ):
+        self._embed_iterator = embed_iterator
+        self._data = data
+        self._queue_depth = max(1, PIPELINE_QUEUE_DEPTH)
+        self._decoded_frames = self._create_queue()
+        self._disposed_frames = self._create_queue()
+        self._processed_frames = self._create_queue()
+        self._frame_disposal = DisposeDuplicateStream()
+        self._decoding_finished = False
+        self._encoder = encoder
+        self._model_name = model_name
+
+    def _create_queue(self) -> asyncio.Queue:
+        return asyncio.Queue(maxsize=self._queue_depth)
+
+    @staticmethod
+    def _next_frame(frames: Iterator[AbstractFrame]) -> Union[AbstractFrame, None]:
+        return next(frames, None)
+
+    async def _decode_stage(self):
+        while True:
+            frame = await asyncio.to_thread(self._next_frame, self._data.frames)
+            await self._decoded_frames.put(frame)
+            if frame is None:
+                return
+
+    async def _get_chunk(self) -> list[AbstractFrame]:
+        """Waits for a frame, then takes the frames already decoded behind it."""
+        chunk_size = self._frame_disposal.get_chunk_size()
+        frame = await self._decoded_frames.get()
+        chunk = []
+        while frame is not None:
+            chunk.append(frame)
+            if len(chunk) == chunk_size or self._decoded_frames.empty():
+                break
+            frame = self._decoded_frames.get_nowait()
+
+        if frame is None:
+            self._decoding_finished = True
+        return chunk
+
+    async def _dispose_stage(self):
+        while not self._decoding_finished:
+            chunk = await self._get_chunk()
+            if not chunk:
+                continue
+
+            kept_frames = await asyncio.to_thread(self._frame_disposal.push, chunk)
+            for kept_frame in kept_frames:
+                await self._disposed_frames.put(kept_frame)
+
+        last_frame = self._frame_disposal.flush()
+        if last_frame:
+            await self._disposed_frames.put(last_frame)
+        await self._disposed_frames.put(None)
+
+    async def _inference_stage(self):
+        bg_process = BGProcessStream(
+            self._embed_iterator,
+            self._disposed_frames,
+            self._processed_frames,
+            self._data.framecount,
+            self._model_name,
+        )
+        await bg_process.process()
+
+    async def _encode_stage(self):
+        while True:
+            frame = await self._processed_frames.get()
+            if frame is None:
+                return
+            await asyncio.to_thread(self._encoder.append, frame)
+
+    def _get_stages(self) -> list[Callable[[], Coroutine[Any, Any, None]]]:
+        return [
+            self._decode_stage,
+            self._dispose_stage,
+            self._inference_stage,
+            self._encode_stage,
+        ]
+
+    async def _run_stages(self):
+        tasks = [asyncio.create_task(stage()) for stage in self._get_stages()]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        for task in done:
+            task.result()
+
+
+class MediaPipeline(MediaPipelineBase):
+    """
+    Streams frames through decoding, duplicate disposal, inference and
+    encoding. The stages run concurrently and are connected by bounded queues,
+    so at most a queue depth of frames is held between two stages.
+    """
+
+    def __init__(
+        self,
+        embed_iterator: EmbedImageIterator,
+        data: StreamData,
+        encoder: OutputEncoder,
+        model_name: str,
+    ):
+        super().__init__(embed_iterator, data, encoder, model_name)
+
+    async def run(self) -> BytesIO:
+        await self._run_stages()
+        animated_io = await asyncio.to_thread(self._encoder.finalize)
+        return animated_io
@@ -0,0 +1,249 @@
+import asyncio
+import numpy as np
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+from PIL import Image
+from fractions import Fraction
+from typing import Union
+
+from utils.bgr.bgr_sessions import SessionRegistry
+from utils.bgr.bgr_models import ModelStore
+from utils.bgr.bgr_dataclasses import AbstractFrame, ImageFrame
+from utils.bgr.bgr_frames import StoredFrame
+from configuration.command_variables.bgr_variables import (
+    REMBG_MODEL,
+    REMOVAL_ENGINE,
+    INFERENCE_WORKERS,
+)
+
+# (offset, shape) of a frame inside a shared memory block
+FrameSpec = tuple[int, tuple[int, ...]]
+
+
+class SharedFrameBufferBase:
+    def __init__(self, shapes: list[tuple[int, ...]]):
+        self._specs = self._create_specs(shapes)
+        self._size = self._get_size(self._specs)
+        self._shm: Union[SharedMemory, None] = None
+
+    @staticmethod
+    def _create_specs(shapes: list[tuple[int, ...]]) -> list[FrameSpec]:
+        specs = []
+        offset = 0
+        for shape in shapes:
+            specs.append((offset, shape))
+            offset += int(np.prod(shape))
+        return specs
+
+    @staticmethod
+    def _get_size(specs: list[FrameSpec]) -> int:
+        if not specs:
+            return 1
+        offset, shape = specs[-1]
+        return max(1, offset + int(np.prod(shape)))
+
+    def _get_shm(self) -> SharedMemory:
+        if not self._shm:
+            raise RuntimeError("Shared frame buffer is not open.")
+        return self._shm
+
+    def _open(self):
+        self._shm = SharedMemory(create=True, size=self._size)
+
+    def _close(self):
+        if self._shm:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+class SharedFrameBuffer(SharedFrameBufferBase):
+    """A shared memory block holding the raw uint8 pixels of several frames."""
+
+    def __init__(self, shapes: list[tuple[int, ...]]):
+        super().__init__(shapes)
+
+    def __enter__(self):
+        self._open()
+        return self
+
+    def __exit__(self, exception_type, exception, tb):
+        self._close()
+
+    def get_name(self) -> str:
+        return self._get_shm().name
+
+    def get_specs(self) -> list[FrameSpec]:
+        return self._specs
+
+    def write(self, idx: int, array: np.ndarray):
+        write_array(self._get_shm(), self._specs[idx], array)
+
+    def read(self, idx: int) -> np.ndarray:
+        return read_array(self._get_shm(), self._specs[idx])
+
+
+def read_array(shm: SharedMemory, spec: FrameSpec) -> np.ndarray:
+    """Copies a frame out of the shared memory block."""
+    offset, shape = spec
+    view = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+    array = view.copy()
+    del view
+    return array
+
+
+def write_array(shm: SharedMemory, spec: FrameSpec, array: np.ndarray):
+    offset, shape = spec
+    view = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+    view[...] = array
+    del view
+
+
+def init_worker(engine_name: str, model_names: list[str]):
+    """Loads and warms up the default models once per worker process."""
+    for model_name in model_names:
+        SessionRegistry().warm_up(engine_name, model_name)
+
+
+def ping():
+    """Worker entry point which does nothing, used to start the workers."""
+
+
+def remove_background_shared(
+    engine_name: str,
+    model_name: str,
+    input_name: str,
+    output_name: str,
+    input_specs: list[FrameSpec],
+    output_specs: list[FrameSpec],
+):
+    """Worker entry point, runs a batch of frames read from shared memory."""
+    input_shm = SharedMemory(name=input_name)
+    output_shm = SharedMemory(name=output_name)
+    try:
+        frames: list[AbstractFrame] = []
+        for spec in input_specs:
+            image = Image.fromarray(read_array(input_shm, spec))
+            width, height = image.size
+            frame = ImageFrame(
+                image=image, width=width, height=height, duration=Fraction(0)
+            )
+            frames.append(frame)
+
+        engine = SessionRegistry().get_engine(engine_name, model_name)
+        frames = engine.remove_background(frames)
+
+        for frame, spec in zip(frames, output_specs):
+            output_array = np.asarray(frame.image.convert("RGBA"))
+            write_array(output_shm, spec, output_array)
+    finally:
+        input_shm.close()
+        output_shm.close()
+
+
+class InferencePoolBase:
+    def __init__(self):
+        self._workers = max(1, INFERENCE_WORKERS)
+        self._engine_name = REMOVAL_ENGINE
+        self._model_names = ModelStore().get_default_models()
+        self._executor: Union[ProcessPoolExecutor, None] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if not self._executor:
+            mp_context = multiprocessing.get_context("spawn")
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._workers,
+                mp_context=mp_context,
+                initializer=init_worker,
+                initargs=(self._engine_name, self._model_names),
+            )
+        return self._executor
+
+    @staticmethod
+    def _frame_array(frame: AbstractFrame) -> np.ndarray:
+        if isinstance(frame, StoredFrame):
+            return frame.array
+        image = frame.image
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        return np.asarray(image)
+
+    @staticmethod
+    def _insert_array(frame: AbstractFrame, array: np.ndarray):
+        if isinstance(frame, StoredFrame):
+            frame.array[...] = array
+            return
+        frame.image = Image.fromarray(array)
+
+    def _shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class InferencePool(InferencePoolBase):
+    """Process pool which runs frame batches on worker processes."""
+
+    def __init__(self):
+        pass  # For Singleton class to work properly
+
+    def __new__(cls, *args, **kwargs):
+        if not hasattr(cls, "instance") or not isinstance(cls.instance, cls):
+            cls.instance = super(InferencePool, cls).__new__(cls)
+            super(cls, cls.instance).__init__(*args, **kwargs)
+        return cls.instance
+
+    async def remove_background(
+        self, frames: list[AbstractFrame], model_name: str = REMBG_MODEL
+    ) -> list[AbstractFrame]:
+        """
+        Runs a batch of frames on the next free worker process. Workers load
+        the default still and animation models on start, and any other model
+        on first use.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+
+        arrays = [self._frame_array(frame) for frame in frames]
+        input_shapes = [array.shape for array in arrays]
+        output_shapes = [array.shape[:2] + (4,) for array in arrays]
+
+        with (
+            SharedFrameBuffer(input_shapes) as input_buffer,
+            SharedFrameBuffer(output_shapes) as output_buffer,
+        ):
+            for idx, array in enumerate(arrays):
+                input_buffer.write(idx, array)
+            del arrays
+
+            await loop.run_in_executor(
+                executor,
+                remove_background_shared,
+                self._engine_name,
+                model_name,
+                input_buffer.get_name(),
+                output_buffer.get_name(),
+                input_buffer.get_specs(),
+                output_buffer.get_specs(),
+            )
+
+            for idx, frame in enumerate(frames):
+                self._insert_array(frame, output_buffer.read(idx))
+        return frames
+
+    async def warm_up(self):
+        """
+        Starts the worker processes, which load and warm up the default
+        models in their initializer.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        # Workers are spawned on demand, one per task submitted while all are busy
+        pings = [loop.run_in_executor(executor, ping) for _ in range(self._workers)]
+        await asyncio.gather(*pings)
+
+    def shutdown(self):
+        self._shutdown()
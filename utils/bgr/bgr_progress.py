@@ -0,0 +1,85 @@
+import time
+import asyncio
+
+from io import BytesIO
+from PIL import Image
+from typing import Union
+
+from utils.bgr.bgr_embeds import EmbedImageIterator
+from utils.bgr.bgr_dataclasses import AbstractFrame
+from logger.exception_logging import ExceptionLogger
+from configuration.command_variables.bgr_variables import (
+    PROGRESS_INTERVAL,
+    PROGRESS_THUMBNAIL_PX,
+)
+
+
+class ProgressReporterBase:
+    def __init__(self, embed_iterator: EmbedImageIterator):
+        self._embed_iterator = embed_iterator
+        self._interval = PROGRESS_INTERVAL
+        self._thumbnail_px = PROGRESS_THUMBNAIL_PX
+        # Only the latest progress is kept, older reports are skipped
+        self._latest: Union[tuple[AbstractFrame, int, int], None] = None
+        self._task: Union[asyncio.Task, None] = None
+        self._last_sent = 0.0
+
+    def _create_thumbnail(self, frame: AbstractFrame) -> BytesIO:
+        # Resized into a new image, the frame itself is part of the result
+        image = frame.image
+        scale = min(1.0, self._thumbnail_px / max(image.size))
+        width = max(1, round(image.width * scale))
+        height = max(1, round(image.height * scale))
+        image = image.resize((width, height), Image.LANCZOS)
+        image = image.convert("P", colors=256)
+        image_io = BytesIO()
+        image.save(image_io, format="PNG")
+        image_io.seek(0)
+        return image_io
+
+    async def _send_latest(self):
+        while self._latest is not None:
+            delay = self._last_sent + self._interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            frame, idx, total = self._latest
+            self._latest = None
+            try:
+                image_io = await asyncio.to_thread(self._create_thumbnail, frame)
+                await self._embed_iterator.update(idx, total, image_io)
+            except Exception as error:
+                # Progress is cosmetic and never fails the job
+                ExceptionLogger(error).log()
+            self._last_sent = time.monotonic()
+
+    def _report(self, frame: AbstractFrame, idx: int, total: int):
+        self._latest = (frame, idx, total)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._send_latest())
+
+    async def _close(self):
+        self._latest = None
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+class ProgressReporter(ProgressReporterBase):
+    """
+    Shows the progress of a job in its embed without holding up the job.
+    Edits are sent at most once per PROGRESS_INTERVAL, reports arriving in
+    between replace each other, and the thumbnail is only encoded for the
+    report which is sent.
+    """
+
+    def __init__(self, embed_iterator: EmbedImageIterator):
+        super().__init__(embed_iterator)
+
+    def report(self, frame: AbstractFrame, idx: int, total: int):
+        """Records the progress and returns immediately."""
+        self._report(frame, idx, total)
+
+    async def close(self):
+        """Drops pending progress and cancels an edit in flight."""
+        await self._close()
@@ -0,0 +1,149 @@
+import numpy as np
+
+from rembg import remove
+from rembg.bg import naive_cutout
+from rembg.session_base import BaseSession
+from rembg.session_simple import SimpleSession
+from typing import Union
+
+from PIL import Image
+from PIL.Image import Image as ImageType
+from numpy import ndarray
+
+from utils.bgr.bgr_dataclasses import AbstractFrame
+from utils.bgr.bgr_frames import StoredFrame
+
+
+def apply_mask(array: ndarray, mask: ndarray):
+    """
+    Applies an (H, W) uint8 mask to an (H, W, 4) uint8 array in place, with
+    the same rounding as naive_cutout pasting the image through the mask
+    onto transparency.
+    """
+    mask_array = mask.astype(np.uint16)[:, :, np.newaxis]
+    blended = array * mask_array
+    blended += 128
+    blended += blended >> 8
+    blended >>= 8
+    array[...] = blended
+
+
+class BGRemoveBase:
+    def __init__(self, frame: AbstractFrame, session: BaseSession):
+        self._frame = frame
+        self._session = session
+
+    def _retrieve_image(self) -> ImageType:
+        return self._frame.image
+
+    @staticmethod
+    def _insert_image(image: ImageType, frame: AbstractFrame) -> AbstractFrame:
+        frame.image = image
+        return frame
+
+    @staticmethod
+    def _image_conversion(image: Union[ImageType, bytes, ndarray]) -> ImageType:
+        if isinstance(image, ImageType):
+            return image
+
+        if isinstance(image, bytes):
+            return Image.open(image)
+
+        return Image.fromarray(image)
+
+
+class BGRemove(BGRemoveBase):
+    def __init__(self, frame: AbstractFrame, session: BaseSession):
+        super().__init__(frame, session)
+        self.frame = frame
+
+    def remove_background(self) -> AbstractFrame:
+        image = self._retrieve_image()
+        rembg_out = remove(data=image, session=self._session)
+        rembg_image = self._image_conversion(rembg_out)
+        frame = self._insert_image(rembg_image, self.frame)
+        return frame
+
+
+class BGRemoveBatchBase:
+    # Normalization used by rembg's SimpleSession (u2net, u2netp, u2net_human_seg)
+    _mean = (0.485, 0.456, 0.406)
+    _std = (0.229, 0.224, 0.225)
+    _size = (320, 320)
+
+    def __init__(self, frames: list[AbstractFrame], session: BaseSession):
+        self._frames = frames
+        self._session = session
+
+    def _supports_batching(self) -> bool:
+        """Models exported with a fixed batch dimension can only run one frame."""
+        if not isinstance(self._session, SimpleSession):
+            return False
+        batch_dim = self._session.inner_session.get_inputs()[0].shape[0]
+        return not isinstance(batch_dim, int)
+
+    def _get_input_name(self) -> str:
+        return self._session.inner_session.get_inputs()[0].name
+
+    def _normalize_frames(self) -> dict[str, ndarray]:
+        input_name = self._get_input_name()
+        tensors = []
+        for frame in self._frames:
+            normalized = self._session.normalize(
+                frame.image, self._mean, self._std, self._size
+            )
+            tensors.append(normalized[input_name])
+        batch_tensor = np.concatenate(tensors, axis=0)
+        return {input_name: batch_tensor}
+
+    @staticmethod
+    def _create_mask(prediction: ndarray, size: tuple[int, int]) -> ImageType:
+        pred_max = np.max(prediction)
+        pred_min = np.min(prediction)
+        pred_range = pred_max - pred_min
+        if pred_range == 0:
+            pred_range = 1
+
+        prediction = (prediction - pred_min) / pred_range
+        mask = Image.fromarray((prediction * 255).astype("uint8"), mode="L")
+        mask = mask.resize(size, Image.LANCZOS)
+        return mask
+
+    def _predict_masks(self) -> list[ImageType]:
+        ort_outs = self._session.inner_session.run(None, self._normalize_frames())
+        predictions = ort_outs[0][:, 0, :, :]
+
+        masks = []
+        for frame, prediction in zip(self._frames, predictions):
+            mask = self._create_mask(prediction, frame.image.size)
+            masks.append(mask)
+        return masks
+
+    def _cutout(self, frame: AbstractFrame, mask: ImageType):
+        if isinstance(frame, StoredFrame):
+            apply_mask(frame.array, np.asarray(mask))
+            return
+        frame.image = naive_cutout(frame.image, mask)
+
+    def _remove_per_frame(self) -> list[AbstractFrame]:
+        frames = []
+        for frame in self._frames:
+            frame = BGRemove(frame, self._session).remove_background()
+            frames.append(frame)
+        return frames
+
+
+class BGRemoveBatch(BGRemoveBatchBase):
+    """Removes the background of several frames with a single session run."""
+
+    def __init__(self, frames: list[AbstractFrame], session: BaseSession):
+        super().__init__(frames, session)
+
+    def remove_background(self) -> list[AbstractFrame]:
+        if not self._supports_batching():
+            return self._remove_per_frame()
+
+        masks = self._predict_masks()
+        for frame, mask in zip(self._frames, masks):
+            self._cutout(frame, mask)
+        return self._frames
@@ -0,0 +1,173 @@
+import asyncio
+
+from collections import OrderedDict, Counter, deque
+from dataclasses import dataclass, field
+from typing import Callable, Coroutine, Any
+from nextcord.ext.commands import Context
+
+from exceptions.job_exceptions import ExceedsUserJobLimit, ExceedsGuildJobLimit
+from configuration.command_variables.bgr_variables import (
+    MAX_CONCURRENT_JOBS,
+    MAX_JOBS_PER_USER,
+    MAX_JOBS_PER_GUILD,
+)
+
+PositionCallback = Callable[[int], Coroutine[Any, Any, Any]]
+
+
+@dataclass(eq=False)
+class Job:
+    user_id: int
+    guild_id: int
+    on_position: PositionCallback
+    started: asyncio.Event = field(default_factory=asyncio.Event)
+    position: int = 0
+
+
+class JobSchedulerBase:
+    def __init__(self):
+        self._max_jobs = max(1, MAX_CONCURRENT_JOBS)
+        self._running = 0
+        self._waiting: OrderedDict[int, deque[Job]] = OrderedDict()
+        self._user_jobs: Counter[int] = Counter()
+        self._guild_jobs: Counter[int] = Counter()
+        self._notify_tasks: set[asyncio.Task] = set()
+
+    def _check_limits(self, user_id: int, guild_id: int):
+        if self._user_jobs[user_id] >= MAX_JOBS_PER_USER:
+            raise ExceedsUserJobLimit(MAX_JOBS_PER_USER)
+
+        # Direct messages share guild id 0 and are only limited per user
+        if guild_id and self._guild_jobs[guild_id] >= MAX_JOBS_PER_GUILD:
+            raise ExceedsGuildJobLimit(MAX_JOBS_PER_GUILD)
+
+    def _register(self, job: Job):
+        self._user_jobs[job.user_id] += 1
+        self._guild_jobs[job.guild_id] += 1
+
+    def _unregister(self, job: Job):
+        self._user_jobs[job.user_id] -= 1
+        self._guild_jobs[job.guild_id] -= 1
+        if self._user_jobs[job.user_id] <= 0:
+            del self._user_jobs[job.user_id]
+        if self._guild_jobs[job.guild_id] <= 0:
+            del self._guild_jobs[job.guild_id]
+
+    def _enqueue(self, job: Job):
+        guild_queue = self._waiting.setdefault(job.guild_id, deque())
+        guild_queue.append(job)
+
+    def _remove_waiting(self, job: Job):
+        guild_queue = self._waiting.get(job.guild_id)
+        if guild_queue is None or job not in guild_queue:
+            return
+        guild_queue.remove(job)
+        if not guild_queue:
+            del self._waiting[job.guild_id]
+
+    def _waiting_order(self) -> list[Job]:
+        """Returns the waiting jobs in the order they will be dispatched."""
+        guild_queues = [list(guild_queue) for guild_queue in self._waiting.values()]
+        max_depth = max((len(guild_queue) for guild_queue in guild_queues), default=0)
+
+        order = []
+        for depth in range(max_depth):
+            for guild_queue in guild_queues:
+                if depth < len(guild_queue):
+                    order.append(guild_queue[depth])
+        return order
+
+    def _notify_positions(self):
+        for position, job in enumerate(self._waiting_order(), start=1):
+            if job.position == position:
+                continue
+            job.position = position
+            task = asyncio.create_task(job.on_position(position))
+            self._notify_tasks.add(task)
+            task.add_done_callback(self._notify_tasks.discard)
+
+    def _dispatch(self):
+        """Starts waiting jobs round-robin across guilds while slots are free."""
+        while self._running < self._max_jobs and self._waiting:
+            guild_id, guild_queue = next(iter(self._waiting.items()))
+            job = guild_queue.popleft()
+            if guild_queue:
+                self._waiting.move_to_end(guild_id)
+            else:
+                del self._waiting[guild_id]
+
+            self._running += 1
+            job.started.set()
+
+        self._notify_positions()
+
+    def _release(self, job: Job):
+        if job.started.is_set():
+            self._running -= 1
+        else:
+            self._remove_waiting(job)
+        self._unregister(job)
+        self._dispatch()
+
+
+class JobSlot:
+    """Async context manager which waits for and holds a job slot."""
+
+    def __init__(self, job: Job, release: Callable[[Job], None]):
+        self._job = job
+        self._release = release
+
+    async def __aenter__(self):
+        try:
+            await self._job.started.wait()
+        except BaseException:
+            self._release(self._job)
+            raise
+        return self
+
+    async def __aexit__(self, exception_type, exception, tb):
+        self._release(self._job)
+
+
+class JobScheduler(JobSchedulerBase):
+    """
+    Global scheduler which bounds the number of jobs running at once.
+    Waiting jobs are dispatched round-robin across guilds.
+    """
+
+    def __init__(self):
+        pass  # For Singleton class to work properly
+
+    def __new__(cls, *args, **kwargs):
+        if not hasattr(cls, "instance") or not isinstance(cls.instance, cls):
+            cls.instance = super(JobScheduler, cls).__new__(cls)
+            super(cls, cls.instance).__init__(*args, **kwargs)
+        return cls.instance
+
+    @staticmethod
+    def _get_guild_id(ctx: Context) -> int:
+        if ctx.guild:
+            return ctx.guild.id
+        return 0
+
+    def acquire(self, ctx: Context, on_position: PositionCallback) -> JobSlot:
+        """
+        Queues a job for the author of the context. The callback is awaited
+        with the 1-based queue position whenever it changes while waiting.
+        """
+        job = Job(
+            user_id=ctx.author.id,
+            guild_id=self._get_guild_id(ctx),
+            on_position=on_position,
+        )
+        self._check_limits(job.user_id, job.guild_id)
+        self._register(job)
+        self._enqueue(job)
+        self._dispatch()
+        return JobSlot(job, self._release)
+
+    def get_queue_length(self) -> int:
+        return sum(len(guild_queue) for guild_queue in self._waiting.values())
+
+    def get_running(self) -> int:
+        return self._running
@@ -0,0 +1,105 @@
+import os
+import logging
+import threading
+
+from collections import OrderedDict
+
+from utils.bgr.bgr_engines import RemovalEngine, REMOVAL_ENGINES
+from utils.bgr.bgr_models import ModelStore
+from configuration.command_variables.bgr_variables import (
+    REMBG_MODEL,
+    REMOVAL_ENGINE,
+    SESSION_MEMORY_CAP_MB,
+)
+
+logger = logging.getLogger("nextcord")
+
+
+class SessionRegistryBase:
+    def __init__(self):
+        self._engines: OrderedDict[str, RemovalEngine] = OrderedDict()
+        self._engine_sizes: dict[str, int] = {}
+        self._memory_cap = SESSION_MEMORY_CAP_MB * 1024 * 1024
+        self._lock = threading.Lock()
+        self._warmed_up: set[str] = set()
+
+    @staticmethod
+    def _get_key(engine_name: str, model_name: str) -> str:
+        return f"{engine_name}:{model_name}"
+
+    def _get_total_size(self) -> int:
+        return sum(self._engine_sizes.values())
+
+    def _evict_engines(self, required_size: int):
+        while self._engines and (
+            self._get_total_size() + required_size > self._memory_cap
+        ):
+            key, _ = self._engines.popitem(last=False)
+            self._engine_sizes.pop(key, None)
+            logger.log(logging.INFO, f"Evicted removal engine: {key}")
+
+    @staticmethod
+    def _get_model_size(model_name: str) -> int:
+        model_path = ModelStore().get_model_path(model_name)
+        if os.path.isfile(model_path):
+            return os.path.getsize(model_path)
+        return 0
+
+    def _create_engine(self, engine_name: str, model_name: str) -> RemovalEngine:
+        engine_type = REMOVAL_ENGINES.get(engine_name)
+        if engine_type is None:
+            raise ValueError(f"Unknown removal engine: {engine_name}")
+
+        key = self._get_key(engine_name, model_name)
+        # Engines are evicted before loading, so the cap also bounds the peak
+        self._evict_engines(self._get_model_size(model_name))
+        engine = engine_type(model_name)
+        engine_size = engine.get_memory_size()
+        # Models downloaded or generated by the engine only have a size now
+        self._evict_engines(engine_size)
+        self._engines[key] = engine
+        self._engine_sizes[key] = engine_size
+        logger.log(logging.INFO, f"Created removal engine: {key}")
+        return engine
+
+    def _get_engine(self, engine_name: str, model_name: str) -> RemovalEngine:
+        with self._lock:
+            key = self._get_key(engine_name, model_name)
+            engine = self._engines.get(key)
+            if engine is not None:
+                self._engines.move_to_end(key)
+                return engine
+            return self._create_engine(engine_name, model_name)
+
+
+class SessionRegistry(SessionRegistryBase):
+    """Process-wide registry of removal engines keyed by engine and model name."""
+
+    def __init__(self):
+        pass  # For Singleton class to work properly
+
+    def __new__(cls, *args, **kwargs):
+        if not hasattr(cls, "instance") or not isinstance(cls.instance, cls):
+            cls.instance = super(SessionRegistry, cls).__new__(cls)
+            super(cls, cls.instance).__init__(*args, **kwargs)
+        return cls.instance
+
+    def get_engine(
+        self, engine_name: str = REMOVAL_ENGINE, model_name: str = REMBG_MODEL
+    ) -> RemovalEngine:
+        """Returns the engine running the model, creating it on first use."""
+        return self._get_engine(engine_name, model_name)
+
+    def warm_up(self, engine_name: str = REMOVAL_ENGINE, model_name: str = REMBG_MODEL):
+        """Loads the model and runs a dummy inference so the first job is not cold."""
+        key = self._get_key(engine_name, model_name)
+        if key in self._warmed_up:
+            return
+        engine = self._get_engine(engine_name, model_name)
+        engine.warm_up()
+        self._warmed_up.add(key)
+        logger.log(logging.INFO, f"Warmed up removal engine: {key}")
+
+    def get_loaded_models(self) -> list[str]:
+        with self._lock:
+            return list(self._engines.keys())
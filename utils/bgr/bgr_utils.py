@@ -1,101 +1,163 @@
+import time
 import asyncio
-from nextcord.ext.commands import Context
 
-from rembg import remove
-from io import BytesIO
-from typing import Union
-
-from PIL import Image
-from PIL.Image import Image as ImageType
-from numpy import ndarray
+from collections import deque
+from typing import Union, AsyncIterator
 
 from utils.bgr.bgr_embeds import EmbedImageIterator
+from utils.bgr.bgr_progress import ProgressReporter
+from utils.bgr.bgr_sessions import SessionRegistry
+from utils.bgr.bgr_pool import InferencePool
+from logger.metrics_logging import MetricsLogger
+from configuration.command_variables.bgr_variables import (
+    INFERENCE_BATCH_SIZE,
+    INFERENCE_BACKEND,
+    INFERENCE_WORKERS,
+    REMOVAL_ENGINE,
+    REMBG_MODEL,
+)
 from utils.bgr.bgr_dataclasses import (
     AbstractData,
     AbstractFrame,
 )
 
 
-class BGRemoveBase:
-    def __init__(self, frame: AbstractFrame):
-        self._frame = frame
-
-    def _retrieve_image(self) -> ImageType:
-        return self._frame.image
-
-    @staticmethod
-    def _insert_image(image: ImageType, frame: AbstractFrame) -> AbstractFrame:
-        frame.image = image
-        return frame
+class BGProcessBase:
+    def __init__(self, embed_iterator: EmbedImageIterator, model_name: str):
+        self._embed_iterator = embed_iterator
+        self._model_name = model_name
+        self._progress = ProgressReporter(embed_iterator)
+        self._batch_size = max(1, INFERENCE_BATCH_SIZE)
+        self._max_in_flight = self._get_max_in_flight()
+        self._inference_time = 0.0
+        self._framecount = 0
 
     @staticmethod
-    def _image_conversion(image: Union[ImageType, bytes, ndarray]) -> ImageType:
-        if isinstance(image, ImageType):
-            return image
+    def _get_max_in_flight() -> int:
+        if INFERENCE_BACKEND == "process":
+            return max(1, INFERENCE_WORKERS)
+        return 1
+
+    def _process_batch(self, frames: list[AbstractFrame]) -> list[AbstractFrame]:
+        engine = SessionRegistry().get_engine(model_name=self._model_name)
+        return engine.remove_background(frames)
+
+    async def _run_batch(self, frames: list[AbstractFrame]) -> list[AbstractFrame]:
+        start_time = time.perf_counter()
+        if INFERENCE_BACKEND == "process":
+            frames = await InferencePool().remove_background(frames, self._model_name)
+        else:
+            frames = await asyncio.to_thread(self._process_batch, frames)
+        self._inference_time += time.perf_counter() - start_time
+        self._framecount += len(frames)
+        return frames
+
+    async def _process_batches(
+        self, batches: AsyncIterator[list[AbstractFrame]]
+    ) -> AsyncIterator[list[AbstractFrame]]:
+        """Keeps up to max_in_flight batches running and yields them in order."""
+        in_flight: deque[asyncio.Task] = deque()
+        try:
+            async for batch in batches:
+                in_flight.append(asyncio.create_task(self._run_batch(batch)))
+                if len(in_flight) >= self._max_in_flight:
+                    yield await in_flight.popleft()
+
+            while in_flight:
+                yield await in_flight.popleft()
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    def _report_progress(self, frame: AbstractFrame, total: int):
+        self._progress.report(frame, self._framecount, total)
+
+    def _log_metrics(self):
+        metrics = MetricsLogger("inference")
+        metrics.add("frames", self._framecount)
+        metrics.add("batch_size", self._batch_size)
+        metrics.add("backend", INFERENCE_BACKEND)
+        metrics.add("engine", REMOVAL_ENGINE)
+        metrics.add("model", self._model_name)
+        metrics.add("seconds", self._inference_time)
+        metrics.add(
+            "seconds_per_frame", self._inference_time / max(1, self._framecount)
+        )
+        metrics.log()
 
-        if isinstance(image, bytes):
-            return Image.open(image)
 
-        return Image.fromarray(image)
-
-
-class BGRemove(BGRemoveBase):
-    def __init__(self, frame: AbstractFrame):
-        super().__init__(frame)
-        self.frame = frame
-
-    def remove_background(self) -> AbstractFrame:
-        image = self._retrieve_image()
-        rembg_out = remove(data=image)
-        rembg_image = self._image_conversion(rembg_out)
-        frame = self._insert_image(rembg_image, self.frame)
-        return frame
-
-
-class BGProcessBase:
-    def __init__(self, data: AbstractData):
+class BGProcess(BGProcessBase):
+    def __init__(
+        self,
+        embed_iterator: EmbedImageIterator,
+        data: AbstractData,
+        model_name: str = REMBG_MODEL,
+    ):
+        super().__init__(embed_iterator, model_name)
         self._data = data
-        self._animated_io: BytesIO = BytesIO()
         self._frames = self._retrieve_frames()
 
     def _retrieve_frames(self) -> list[AbstractFrame]:
         return self._data.frames
 
-    @staticmethod
-    def _retrieve_image(frame: AbstractFrame) -> ImageType:
-        return frame.image
-
-    @staticmethod
-    def _pil_to_bytesio(image: ImageType) -> BytesIO:
-        image_io = BytesIO()
-        image = image.convert("P", colors=256)
-        image.save(image_io, format="PNG", optimize=True)
-        image_io.seek(0)
-        return image_io
-
-    @staticmethod
-    def _process_image(frame: AbstractFrame) -> AbstractFrame:
-        frame = BGRemove(frame).remove_background()
-        return frame
-
-
-class BGProcess(BGProcessBase):
-    def __init__(self, ctx: Context, data: AbstractData):
-        super().__init__(data)
-        self.ctx = ctx
+    async def _batch_frames(self) -> AsyncIterator[list[AbstractFrame]]:
+        for idx in range(0, len(self._frames), self._batch_size):
+            yield self._frames[idx : idx + self._batch_size]
 
     async def process(self) -> AbstractData:
-        embed_iterator = EmbedImageIterator(self.ctx)
-        await embed_iterator.send()
+        await self._embed_iterator.send()
         total_idx = len(self._frames)
 
-        for idx, frame in enumerate(self._frames, start=1):
-            bg_frame = await asyncio.to_thread(self._process_image, frame)
-            bg_image = self._retrieve_image(bg_frame)
-            bg_image_io = await asyncio.to_thread(self._pil_to_bytesio, bg_image)
+        async for bg_frames in self._process_batches(self._batch_frames()):
+            if self._framecount != total_idx:
+                self._report_progress(bg_frames[-1], total_idx)
 
-            if idx != total_idx:
-                await embed_iterator.update(idx, total_idx, bg_image_io)
-
-        await embed_iterator.clean()
+        await self._progress.close()
+        self._log_metrics()
+        await self._embed_iterator.clean()
         return self._data
+
+
+class BGProcessStream(BGProcessBase):
+    """Removes the background of frames flowing between two pipeline queues."""
+
+    def __init__(
+        self,
+        embed_iterator: EmbedImageIterator,
+        frames_in: asyncio.Queue,
+        frames_out: asyncio.Queue,
+        framecount: int,
+        model_name: str = REMBG_MODEL,
+    ):
+        super().__init__(embed_iterator, model_name)
+        self._frames_in = frames_in
+        self._frames_out = frames_out
+        self._expected_framecount = framecount
+
+    async def _batch_frames(self) -> AsyncIterator[list[AbstractFrame]]:
+        batch: list[AbstractFrame] = []
+        while True:
+            frame: Union[AbstractFrame, None] = await self._frames_in.get()
+            if frame is None:
+                break
+            batch.append(frame)
+            if len(batch) == self._batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+    async def process(self):
+        await self._embed_iterator.send()
+
+        async for bg_frames in self._process_batches(self._batch_frames()):
+            for frame in bg_frames:
+                await self._frames_out.put(frame)
+            total = max(self._expected_framecount, self._framecount)
+            self._report_progress(bg_frames[-1], total)
+
+        await self._progress.close()
+        await self._frames_out.put(None)
+        self._log_metrics()
+        await self._embed_iterator.clean()
@@ -291,6 +291,18 @@ class ContextAttachment(ContextAttachmentBase):
         if image_asset:
             return await image_asset.to_file()
 
+    def url_from_reference_embed(self) -> Union[str, None]:
+        image_asset = self._get_reference_embed_image()
+        if image_asset:
+            return image_asset.url
+
+    def any_attachment_url(self) -> Union[str, None]:
+        """URL of the attachment or referenced embed image, without downloading it."""
+        attachment = self.any_attachment()
+        if attachment:
+            return attachment.url
+        return self.url_from_reference_embed()
+
     async def any_file_attachment(self) -> Union[File, None]:
         file = await self.file_from_message()
         if not file:
@@ -61,6 +61,15 @@ class AddMediaRefDescription(InputDescription):
     pos: int = 8
 
 
+@dataclass(frozen=True)
+class OptionsDescription(InputDescription):
+    text: str = (
+        "`[OPTIONS]` ― *Output Format: gif, webp, webp_lossless, apng; "
+        "Model: fast, quantized, quality*"
+    )
+    pos: int = 9
+
+
 @dataclass(frozen=True)
 class CommandInputType:
     header: str
@@ -105,3 +114,15 @@ class MediaWRefInput(CommandInputType):
             MediaRefDescription(),
         }
     )
+
+
+@dataclass(frozen=True)
+class MediaWRefOptionsInput(CommandInputType):
+    header: str = "`[MEDIA]` ⚬ `[R\\MEDIA]` `[OPTIONS]`"
+    input_descriptions: frozenset[InputDescription] = frozenset(
+        {
+            MediaDescription(),
+            MediaRefDescription(),
+            OptionsDescription(),
+        }
+    )
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+
+from aiohttp import (
+    ClientSession,
+    ClientResponse,
+    ClientTimeout,
+    TCPConnector,
+    ClientConnectionError,
+)
+from typing import Union
+
+from configuration.http_config import (
+    HTTP_TOTAL_TIMEOUT,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_CONNECTIONS_PER_HOST,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_DNS_CACHE_TTL,
+    HTTP_RETRIES,
+    HTTP_RETRY_BACKOFF,
+)
+
+logger = logging.getLogger("nextcord")
+
+# Statuses worth retrying, other responses are returned to the caller
+RETRY_STATUSES: set[int] = {429, 500, 502, 503, 504}
+
+
+class HTTPClientBase:
+    def __init__(self):
+        self._session: Union[ClientSession, None] = None
+        self._retries = max(0, HTTP_RETRIES)
+        self._backoff = HTTP_RETRY_BACKOFF
+
+    @staticmethod
+    def _create_connector() -> TCPConnector:
+        connector = TCPConnector(
+            limit=HTTP_MAX_CONNECTIONS,
+            limit_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            use_dns_cache=True,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        )
+        return connector
+
+    @staticmethod
+    def _create_timeout() -> ClientTimeout:
+        timeout = ClientTimeout(
+            total=HTTP_TOTAL_TIMEOUT,
+            sock_connect=HTTP_CONNECT_TIMEOUT,
+            sock_read=HTTP_READ_TIMEOUT,
+        )
+        return timeout
+
+    def _create_session(self) -> ClientSession:
+        session = ClientSession(
+            connector=self._create_connector(),
+            timeout=self._create_timeout(),
+        )
+        return session
+
+    def _get_session(self) -> ClientSession:
+        # Opened lazily as well, for use outside of the bot lifecycle
+        if not self._session or self._session.closed:
+            self._session = self._create_session()
+        return self._session
+
+    def _get_delay(self, attempt: int) -> float:
+        return self._backoff * (2**attempt)
+
+    async def _request(
+        self, method: str, url: str, headers: Union[dict[str, str], None]
+    ) -> ClientResponse:
+        session = self._get_session()
+        attempt = 0
+        while True:
+            try:
+                response = await session.request(method, url, headers=headers)
+            except (ClientConnectionError, asyncio.TimeoutError) as error:
+                if attempt >= self._retries:
+                    raise
+                logger.log(logging.WARNING, f"HTTP {method} {url} failed: {error}")
+            else:
+                if response.status not in RETRY_STATUSES or attempt >= self._retries:
+                    return response
+                response.release()
+                logger.log(
+                    logging.WARNING, f"HTTP {method} {url} returned {response.status}"
+                )
+
+            await asyncio.sleep(self._get_delay(attempt))
+            attempt += 1
+
+    async def _close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class HTTPClient(HTTPClientBase):
+    """
+    Bot-wide HTTP client. A single pooled session keeps connections alive
+    and caches DNS lookups across requests, and failed requests are retried
+    with exponential backoff.
+    """
+
+    def __init__(self):
+        pass  # For Singleton class to work properly
+
+    def __new__(cls, *args, **kwargs):
+        if not hasattr(cls, "instance") or not isinstance(cls.instance, cls):
+            cls.instance = super(HTTPClient, cls).__new__(cls)
+            super(cls, cls.instance).__init__(*args, **kwargs)
+        return cls.instance
+
+    def open(self):
+        """Creates the session, must be called from within the event loop."""
+        self._get_session()
+
+    async def close(self):
+        await self._close()
+
+    def get_session(self) -> ClientSession:
+        return self._get_session()
+
+    async def get(
+        self, url: str, headers: Union[dict[str, str], None] = None
+    ) -> ClientResponse:
+        """Sends a GET request, the caller releases the response."""
+        return await self._request("GET", url, headers)
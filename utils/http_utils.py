@@ -1,28 +1,106 @@
-from aiohttp import ClientResponse, ClientSession
+from aiohttp import ClientResponse
 from sniffpy.mimetype import parse_mime_type
 from sniffpy import sniff
 from nextcord.ext.commands import Context
 from nextcord import Attachment, File
 
+import io
+import asyncio
+
+from PIL import ImageFile
 from io import BytesIO
 from typing import Union
 
-from utils.bgr.bgr_dataclasses import MimeTypeConfig
+from utils.http_client import HTTPClient
+from utils.bgr.bgr_dataclasses import MimeTypeConfig, RemoteFileProbe
 from logger.exception_logging import ExceptionLogger
-from exceptions.bot_exceptions import ContextAttachmentUnavailable
+from exceptions.bot_exceptions import BaseBotException, ContextAttachmentUnavailable
 from exceptions.http_exceptions import (
     ResponseConnectionError,
     ResponseContentError,
+    ResponseStatusError,
     UnsupportedMimeType,
+    ExceedsMaxFileSize,
 )
 
+STREAM_CHUNK_SIZE: int = 64 * 1024
+MIME_SNIFF_SIZE: int = 512
+# Enough for the image headers of most files, including JPEG EXIF segments
+PROBE_SIZE: int = 64 * 1024
+
+# (offset, signature, mime subtype), checked in order
+MAGIC_NUMBERS: list[tuple[int, bytes, str]] = [
+    (0, b"\x89PNG\r\n\x1a\n", "png"),
+    (0, b"\xff\xd8\xff", "jpeg"),
+    (0, b"GIF87a", "gif"),
+    (0, b"GIF89a", "gif"),
+    (8, b"WEBP", "webp"),
+]
+# ISO-BMFF brands of MP4 video, other ftyp files (mov, heic, avif, 3gp) are
+# left to the generic sniffer
+MP4_BRANDS: tuple[bytes, ...] = (b"isom", b"mp41", b"mp42", b"avc1")
+
+
+class MemoryViewIO(io.RawIOBase):
+    """
+    Read-only, seekable file over a memoryview. Reads copy straight from
+    the underlying buffer into the caller's buffer.
+    """
+
+    def __init__(self, buffer: memoryview):
+        super().__init__()
+        self._buffer = buffer.cast("B")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = len(self._buffer) + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+
+        if position < 0:
+            raise ValueError(f"Negative seek position: {position}")
+        self._position = position
+        return position
+
+    def readinto(self, buffer) -> int:
+        data = self._buffer[self._position : self._position + len(buffer)]
+        nbytes = len(data)
+        memoryview(buffer).cast("B")[:nbytes] = data
+        self._position += nbytes
+        return nbytes
+
+    def readall(self) -> bytes:
+        data = bytes(self._buffer[self._position :])
+        self._position += len(data)
+        return data
+
+    def getbuffer(self) -> memoryview:
+        return self._buffer
+
 
 class ContextHTTPBase:
     def __init__(self):
         super().__init__()
-        self._session: ClientSession = ClientSession()
+        self._client = HTTPClient()
         self._response: Union[ClientResponse, None] = None
         self._content: bytes = bytes()
+        # Bytes already read from the body of the response by the probe
+        self._head: bytes = bytes()
+        self._head_complete = False
 
     @staticmethod
     async def _headers() -> dict[str, str]:
@@ -67,11 +145,16 @@ class ContextHTTPBase:
         bytes_io = BytesIO(bytes_content)
         return bytes_io
 
-    async def _setup_response(self, url: str) -> ClientResponse:
+    async def _request(self, url: str, headers: dict[str, str]) -> ClientResponse:
         try:
-            self._response = await self._session.get(url=url, timeout=2)
+            response = await self._client.get(url, headers=headers)
         except Exception:
             raise ResponseConnectionError()
+        return response
+
+    async def _setup_response(self, url: str) -> ClientResponse:
+        headers = await self._headers()
+        self._response = await self._request(url, headers)
         return self._response
 
     async def _get_response(self, url: str) -> ClientResponse:
@@ -79,6 +162,153 @@ class ContextHTTPBase:
             return self._response
         return await self._setup_response(url)
 
+    @staticmethod
+    def _get_total_size(response: ClientResponse) -> Union[int, None]:
+        """Size of the whole file, from Content-Range for partial responses."""
+        if response.status == 206:
+            content_range = response.headers.get("Content-Range", "")
+            total = content_range.rpartition("/")[2]
+            return int(total) if total.isdigit() else None
+        return response.content_length
+
+    @staticmethod
+    def _assert_status(response: ClientResponse):
+        """Rejects error pages before their body is read as the file."""
+        if not 200 <= response.status < 300:
+            raise ResponseStatusError(response.status)
+
+    @staticmethod
+    def _assert_size(size: Union[int, None], max_bytes: int):
+        if size is not None and size > max_bytes:
+            raise ExceedsMaxFileSize(max_bytes)
+
+    @staticmethod
+    async def _read_head(response: ClientResponse, size: int) -> bytes:
+        try:
+            head = await response.content.readexactly(size)
+        except asyncio.IncompleteReadError as error:
+            head = error.partial
+        except Exception:
+            raise ResponseContentError()
+        return head
+
+    @staticmethod
+    def _parse_dimensions(head: bytes) -> tuple[Union[int, None], Union[int, None]]:
+        """Reads the image size from the header, without decoding any pixels."""
+        parser = ImageFile.Parser()
+        try:
+            parser.feed(head)
+        except Exception:
+            return None, None
+        if parser.image is None:
+            return None, None
+        return parser.image.size
+
+    async def _probe_url(self, url: str, max_bytes: int) -> RemoteFileProbe:
+        """
+        Requests the first PROBE_SIZE bytes with a ranged GET. The file is
+        rejected by its size before the body is downloaded. When the server
+        ignores the range, the response is kept and the download resumes
+        from it.
+        """
+        headers = await self._headers()
+        headers["Range"] = f"bytes=0-{PROBE_SIZE - 1}"
+        response = await self._request(url, headers)
+
+        try:
+            self._assert_status(response)
+            size = self._get_total_size(response)
+            self._assert_size(size, max_bytes)
+            head = await self._read_head(response, PROBE_SIZE)
+        except BaseException:
+            response.release()
+            raise
+
+        if response.status == 206:
+            response.release()
+            self._head_complete = size is not None and len(head) >= size
+        else:
+            self._response = response
+            self._head_complete = len(head) < PROBE_SIZE
+
+        self._head = head
+        width, height = self._parse_dimensions(head)
+        mime_type = self._sniff_mime_type(head)
+        return RemoteFileProbe(mime_type, size, width, height)
+
+    async def _read_capped(
+        self, response: ClientResponse, max_bytes: int, head: bytes = bytes()
+    ) -> memoryview:
+        """
+        Streams the response body into a single buffer, presized from the
+        Content-Length, and aborts as soon as it grows past max_bytes.
+        The head is the start of the file which was already read.
+        """
+        self._assert_status(response)
+        total_size = self._get_total_size(response)
+        self._assert_size(total_size, max_bytes)
+        buffer = bytearray(total_size or 0)
+
+        size = len(head)
+        buffer[:size] = head
+        try:
+            async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                end = size + len(chunk)
+                if end > max_bytes:
+                    raise ExceedsMaxFileSize(max_bytes)
+                buffer[size:end] = chunk
+                size = end
+        except BaseBotException:
+            raise
+        except Exception:
+            raise ResponseContentError()
+
+        return memoryview(buffer)[:size]
+
+    @staticmethod
+    def _is_mp4(head: bytes) -> bool:
+        """Matches the major, then the compatible brands of the ftyp box."""
+        if head[4:8] != b"ftyp":
+            return False
+        if head[8:12] in MP4_BRANDS:
+            return True
+
+        box_size = min(int.from_bytes(head[:4], "big"), len(head))
+        # The compatible brands follow the major brand and its minor version
+        for offset in range(16, box_size - 3, 4):
+            if head[offset : offset + 4] in MP4_BRANDS:
+                return True
+        return False
+
+    def _sniff_mime_type(self, head: Union[bytes, memoryview]) -> str:
+        """Matches the first bytes against known signatures."""
+        head = bytes(head[:MIME_SNIFF_SIZE])
+        for offset, signature, mime_type in MAGIC_NUMBERS:
+            if head[offset : offset + len(signature)] == signature:
+                return mime_type
+        if self._is_mp4(head):
+            return "mp4"
+
+        content_type = sniff(head).__str__()
+        parse_mime = parse_mime_type(content_type)
+        return parse_mime.subtype
+
+    async def _from_url_capped(self, url: str, max_bytes: int) -> memoryview:
+        if self._head_complete:
+            return memoryview(self._head)
+        if self._response or not self._head:
+            response = await self._get_response(url)
+            return await self._read_capped(response, max_bytes, self._head)
+
+        # The probe was served as a range, only the remainder is requested
+        headers = await self._headers()
+        headers["Range"] = f"bytes={len(self._head)}-"
+        self._response = await self._request(url, headers)
+        if self._response.status == 416:
+            return memoryview(self._head)
+        head = self._head if self._response.status == 206 else bytes()
+        return await self._read_capped(self._response, max_bytes, head)
+
     @staticmethod
     async def _get_mime_type_file(file: File) -> str:
         file_bytes = file.fp.read()
@@ -96,9 +326,9 @@ class ContextHTTPBase:
         return mime_type
 
     async def _close_client(self):
-        await self._session.close()
+        # The pooled session is shared, only the connection is released
         if self._response:
-            self._response.close()
+            self._response.release()
 
     async def _from_url(self, url: str) -> BytesIO:
         response = await self._get_response(url)
@@ -136,6 +366,14 @@ class ContextHTTPFile(ContextHTTPBase):
             return mime_type
         raise UnsupportedMimeType(mime_type)
 
+    def assert_mime_type_from_buffer(
+        self, buffer: memoryview, mime_config: MimeTypeConfig
+    ) -> str:
+        mime_type = self._sniff_mime_type(buffer)
+        if mime_type in mime_config.mime_types:
+            return mime_type
+        raise UnsupportedMimeType(mime_type)
+
     async def get_ctx_attachment_url(self, ctx: Context) -> str:
         attachment_url = await self._get_attachment_url(ctx)
         return attachment_url
@@ -153,3 +391,24 @@ class ContextHTTPFile(ContextHTTPBase):
         attachment_url = attachment.url
         bytes_io = await self._from_url(attachment_url)
         return bytes_io
+
+    async def probe_url(
+        self, url: str, max_bytes: int, mime_config: MimeTypeConfig
+    ) -> RemoteFileProbe:
+        """
+        Checks the size and mime type of the file behind the url from its
+        first bytes. Raises ResponseStatusError, ExceedsMaxFileSize or
+        UnsupportedMimeType.
+        """
+        probe = await self._probe_url(url, max_bytes)
+        if probe.mime_type in mime_config.mime_types:
+            return probe
+        raise UnsupportedMimeType(probe.mime_type)
+
+    async def get_buffer_from_url(self, url: str, max_bytes: int) -> memoryview:
+        """
+        Downloads in chunks, raising ExceedsMaxFileSize past max_bytes.
+        Continues from the bytes already read by probe_url.
+        """
+        buffer = await self._from_url_capped(url, max_bytes)
+        return buffer